@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with its work factor read from the
+    `PASSWORD_HASH_ITERATIONS` setting instead of hardcoded.
+
+    The algorithm name is unchanged, so existing hashes keep verifying. Ones
+    made with another iteration count are flagged by `must_update` and
+    rehashed at the new cost the next time their user logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
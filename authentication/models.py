@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -83,3 +84,40 @@ class User(AbstractBaseUser, PermissionsMixin):
     @property
     def is_superuser(self):
         return self.is_admin
+
+class OutboxEmail(models.Model):
+    """
+    Email waiting to be delivered by the `send_outbox` worker, so requests
+    only write a row (in their own transaction) instead of talking to the
+    SMTP server. See `authentication.outbox`.
+    """
+
+    STATUS_CHOICES = [
+        ('PENDING', 'PENDING'),
+        ('SENT', 'SENT'),
+        ('FAILED', 'FAILED'),
+    ]
+
+    to = models.CharField(max_length=128)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(choices=STATUS_CHOICES, max_length=16, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker delivering the email, until `claimed_until`, after
+    # which a crashed worker's emails can be claimed again.
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # workers: pending emails due for an attempt
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
@@ -0,0 +1,135 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+def enqueue(to, subject, body):
+    """
+    Queues an email for the `send_outbox` worker. Call it within the
+    transaction writing whatever the email is about, so either both are
+    committed or neither is.
+    """
+
+    return OutboxEmail.objects.create(to=to, subject=subject, body=body)
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff: `EMAIL_OUTBOX_RETRY_DELAY` seconds after the first
+    failed attempt, doubling with every further one, at most a day.
+    """
+
+    return timedelta(seconds=min(settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), 24 * 60 * 60))
+
+
+def claimable(now):
+    return Q(status='PENDING', next_attempt_at__lte=now) & (Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+
+
+def lease(batch_size):
+    """
+    How long a worker owns the `batch_size` emails it claims: at least
+    `EMAIL_OUTBOX_LEASE` seconds, and enough for every one of them to time
+    out both connecting and sending (`EMAIL_TIMEOUT`), so a slow batch is
+    never claimed again while it is being delivered.
+    """
+
+    return timedelta(seconds=max(settings.EMAIL_OUTBOX_LEASE, batch_size * 2 * settings.EMAIL_TIMEOUT))
+
+
+def claim(batch_size):
+    """
+    Claims up to `batch_size` due emails for this worker for their `lease`
+    and returns them.
+
+    Claiming is a single conditional `UPDATE` stamping the rows with a token
+    unique to this batch, so when workers race for the same rows each one is
+    claimed by exactly one of them, on any database and without holding
+    locks while sending.
+    """
+
+    now = timezone.now()
+    token = uuid.uuid4().hex
+
+    ids = list(OutboxEmail.objects.filter(claimable(now)).order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+
+    OutboxEmail.objects.filter(claimable(now), id__in=ids).update(
+        claimed_by=token,
+        claimed_until=now + lease(batch_size)
+    )
+    return list(OutboxEmail.objects.filter(claimed_by=token))
+
+
+def deliver(emails):
+    """
+    Sends the claimed `emails` over a single connection of the configured
+    `EMAIL_BACKEND` and records the outcome of each as soon as it is known:
+    sent emails are marked so, failed ones are retried after `retry_delay`
+    until they have been attempted `EMAIL_OUTBOX_MAX_ATTEMPTS` times.
+
+    Outcomes are only recorded while the claim holds. Emails left once the
+    lease has run out aren't sent, another worker may have claimed them.
+
+    Returns the number of emails sent.
+    """
+
+    if not emails:
+        return 0
+
+    sent = 0
+    connection = get_connection()
+    opened = False
+
+    try:
+        for email in emails:
+            if timezone.now() >= email.claimed_until:
+                break
+
+            message = EmailMessage(to=[email.to], subject=email.subject, body=email.body, connection=connection)
+            try:
+                if not opened:
+                    connection.open()
+                    opened = True
+                connection.send_messages([message])
+            except Exception as e:
+                fail(email, e)
+                # The connection may be what failed, the next email opens a fresh one.
+                connection.close()
+                opened = False
+            else:
+                claimed(email).update(
+                    status='SENT',
+                    sent_at=timezone.now(),
+                    attempts=F('attempts') + 1,
+                    claimed_by='',
+                    claimed_until=None
+                )
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent
+
+
+def claimed(email):
+    return OutboxEmail.objects.filter(id=email.id, claimed_by=email.claimed_by)
+
+
+def fail(email, error):
+    attempts = email.attempts + 1
+    claimed(email).update(
+        status='FAILED' if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS else 'PENDING',
+        attempts=attempts,
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        last_error=f'{type(error).__name__}: {error}',
+        claimed_by='',
+        claimed_until=None
+    )
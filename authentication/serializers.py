@@ -28,24 +28,17 @@ class EmailVerificationSerializer(serializers.Serializer):
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField(max_length=64, min_length=4)
     password = serializers.CharField(max_length=64, min_length=4, write_only=True)
-    tokens = serializers.SerializerMethodField()
-
-
-    def get_tokens(self, obj):
-
-        user = User.objects.get(email=obj.get('email'))
-
-        return {
-            'access': user.tokens().get('access'),
-            'refresh': user.tokens().get('refresh')
-        }
+    tokens = serializers.DictField(child=serializers.CharField(), read_only=True)
 
 
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
 
+        # The only query of the login: `authenticate` loads the user (and
+        # saves the password if its hash is outdated, see `hashers`).
         user = authenticate(
+            request=self.context.get('request'),
             email=email,
             password=password
         )
@@ -56,11 +49,9 @@ class LoginSerializer(serializers.Serializer):
         if not user.is_verified:
             raise AuthenticationFailed("This account is not verified.")
 
-        user_obj = User.objects.get(email=email)
-
         return {
-            'email': attrs.get('email'),
-            'tokens': user_obj.tokens()
+            'email': user.email,
+            'tokens': user.tokens()
         }
 
 class RequestPasswordResetEmailSerializer(serializers.Serializer):
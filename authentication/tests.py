@@ -1,3 +1,158 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from incomeexpensesapi.testing import LedgerAPITestCase
+
+from . import outbox
+from .models import OutboxEmail
+
+
+class LoginTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        self.user.is_verified = True
+        self.user.save()
+
+    def login(self, password=None):
+        return self.client.post('/auth/login/', {'email': self.user.email, 'password': password or self.password})
+
+    def test_logs_in_with_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.login()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['tokens']), {'access', 'refresh'})
+        self.assertNotIn('password', response.json())
+
+    def test_rejects_wrong_passwords_and_unverified_users(self):
+        self.assertEqual(self.login('Wrong-passw0rd').status_code, 401)
+
+        self.user.is_verified = False
+        self.user.save()
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_outdated_hashes_are_upgraded_on_login(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+@override_settings(EMAIL_TIMEOUT=10, EMAIL_OUTBOX_LEASE=60, EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.emails = [outbox.enqueue(f'user{i}@example.com', 'Verify your email', 'Hello') for i in range(3)]
+
+    def test_claimed_emails_are_delivered_once(self):
+        claimed = outbox.claim(batch_size=2)
+
+        self.assertEqual([email.id for email in claimed], [email.id for email in self.emails[:2]])
+        self.assertEqual([email.id for email in outbox.claim(batch_size=10)], [self.emails[2].id])
+        self.assertEqual(outbox.claim(batch_size=10), [])
+
+        self.assertEqual(outbox.deliver(claimed), 2)
+        self.assertEqual([message.to for message in mail.outbox], [['user0@example.com'], ['user1@example.com']])
+        self.assertEqual(OutboxEmail.objects.filter(status='SENT', attempts=1, claimed_by='').count(), 2)
+
+    def test_the_lease_covers_every_email_timing_out(self):
+        self.assertEqual(outbox.lease(1), timedelta(seconds=60))
+        self.assertEqual(outbox.lease(100), timedelta(seconds=2000))
+
+    def test_failed_emails_are_retried_with_backoff_then_given_up(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            self.assertEqual(outbox.deliver(outbox.claim(batch_size=1)), 0)
+
+        email = OutboxEmail.objects.get(id=self.emails[0].id)
+        self.assertEqual((email.status, email.attempts, email.last_error), ('PENDING', 1, 'OSError: refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=55))
+        # not due yet
+        self.assertNotIn(email.id, [email.id for email in outbox.claim(batch_size=10)])
+
+        OutboxEmail.objects.filter(id=email.id).update(next_attempt_at=timezone.now())
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('refused')):
+            outbox.deliver(outbox.claim(batch_size=10))
+
+        self.assertEqual(OutboxEmail.objects.get(id=email.id).status, 'FAILED')
+
+    def test_sent_emails_are_recorded_right_away(self):
+        claimed = outbox.claim(batch_size=3)
+
+        # the worker gets killed while sending the second email
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=[1, SystemExit()]
+        ), self.assertRaises(SystemExit):
+            outbox.deliver(claimed)
+
+        self.assertEqual(list(OutboxEmail.objects.filter(status='SENT').values_list('id', flat=True)), [self.emails[0].id])
+
+    def test_expired_claims_are_left_to_the_worker_claiming_them_again(self):
+        stale = outbox.claim(batch_size=3)
+        OutboxEmail.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        fresh = outbox.claim(batch_size=3)
+        for email in stale:
+            email.claimed_until = timezone.now() - timedelta(seconds=1)
+
+        self.assertEqual(outbox.deliver(stale), 0)
+        # a late failure of the stale claim changes nothing
+        outbox.fail(stale[0], OSError('late'))
+
+        self.assertEqual(outbox.deliver(fresh), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboxEmail.objects.get(id=stale[0].id).last_error, '')
+
+
+class SignupTests(LedgerAPITestCase):
+
+    def test_signup_queues_the_verification_email(self):
+        self.client.force_authenticate(None)
+
+        response = self.client.post('/auth/signup/', {
+            'email': 'new@example.com', 'full_name': 'New User', 'password': self.password
+        })
+
+        self.assertEqual(response.status_code, 201)
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.to, email.status), ('new@example.com', 'PENDING'))
+        self.assertIn('/auth/verify-email/?token=', email.body)
+        self.assertEqual(mail.outbox, [])
+
+
+class ThrottleTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+
+    def login(self, email='owner@example.com', **extra):
+        return self.client.post('/auth/login/', {'email': email, 'password': 'Wrong-passw0rd'}, **extra)
+
+    def test_logins_per_email_are_limited(self):
+        for _ in range(10):
+            self.assertEqual(self.login().status_code, 401)
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '6')
+        # others keep logging in from the same IP
+        self.assertEqual(self.login('other@example.com').status_code, 401)
+
+    def test_logins_per_ip_are_limited(self):
+        for number in range(30):
+            self.assertEqual(self.login(f'user{number}@example.com').status_code, 401)
+
+        self.assertEqual(self.login('someone@example.com').status_code, 429)
+        self.assertEqual(self.login('someone@example.com', REMOTE_ADDR='10.0.0.2').status_code, 401)
+
+    def test_bodies_that_arent_objects_are_rejected(self):
+        response = self.client.post('/auth/login/', ['owner@example.com'], format='json')
+
+        self.assertEqual(response.status_code, 400)
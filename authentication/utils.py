@@ -1,16 +1,15 @@
-from django.core.mail import EmailMessage
+from .outbox import enqueue
 
 class Util:
 
     @staticmethod
     def send_email(data):
-        email_body = data.get('body')
-        to = data.get('to')
-        subject = data.get('subject')
+        """
+        Queues the email in the outbox, `manage.py send_outbox` delivers it.
+        """
 
-        email = EmailMessage(
-            to=[to,],
-            subject=subject,
-            body=email_body
+        enqueue(
+            to=data.get('to'),
+            subject=data.get('subject'),
+            body=data.get('body')
         )
-        email.send()
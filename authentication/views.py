@@ -2,6 +2,7 @@ from django.shortcuts import render
 from django.urls import reverse
 from django.contrib.sites.shortcuts import get_current_site
 from django.conf import settings
+from django.db import transaction
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import smart_str, smart_bytes, force_str, DjangoUnicodeDecodeError
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
@@ -12,6 +13,8 @@ from rest_framework.views import APIView
 
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from incomeexpensesapi.throttling import EmailRateThrottle, IPRateThrottle
+
 from .serializers import (
     SignupSerializer, EmailVerificationSerializer, LoginSerializer,
     RequestPasswordResetEmailSerializer, PasswordResetSerializer
@@ -31,33 +34,36 @@ class SignupAPIView(generics.GenericAPIView):
     """
 
     serializer_class = SignupSerializer
+    throttle_classes = [IPRateThrottle]
+    throttle_scope = 'signup'
 
     def post(self, request):
 
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
+            with transaction.atomic():
+                user_obj = serializer.save()
 
-            user_data = serializer.data
-            user_obj = User.objects.get(email=user_data.get('email'))
-            # This section is implemented only for allowing newly created users
-            # be redirected to the page where they can verify their account.
-            # Thats why only the access token gets fetched.
-            token = RefreshToken.for_user(user_obj).access_token
+                user_data = serializer.data
+                # This section is implemented only for allowing newly created users
+                # be redirected to the page where they can verify their account.
+                # Thats why only the access token gets fetched.
+                token = RefreshToken.for_user(user_obj).access_token
 
-            current_site = get_current_site(request).domain
-            relative_link = reverse('authentication:verify-email')
-            absurl = f"http://{current_site}{relative_link}?token={token}"
-            email_body = f"Greetings, {user_obj.full_name}!\nUse the link below to verify your email:\n{absurl}"
+                current_site = get_current_site(request).domain
+                relative_link = reverse('authentication:verify-email')
+                absurl = f"http://{current_site}{relative_link}?token={token}"
+                email_body = f"Greetings, {user_obj.full_name}!\nUse the link below to verify your email:\n{absurl}"
 
-            data = {
-                'to': user_obj.email,
-                'subject': 'Verify your email',
-                'body': email_body
-            }
+                data = {
+                    'to': user_obj.email,
+                    'subject': 'Verify your email',
+                    'body': email_body
+                }
 
-            Util.send_email(data)
+                # Delivered by the `send_outbox` worker once committed.
+                Util.send_email(data)
 
             return Response(user_data, status=status.HTTP_201_CREATED)
 
@@ -111,9 +117,11 @@ class LoginAPIView(generics.GenericAPIView):
     """
 
     serializer_class = LoginSerializer
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'login'
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
 
         if serializer.is_valid(raise_exception=True):
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -124,6 +132,8 @@ class RequestPasswordResetEmail(generics.GenericAPIView):
     """
 
     serializer_class = RequestPasswordResetEmailSerializer
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
 
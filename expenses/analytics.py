@@ -0,0 +1,122 @@
+from datetime import date, timedelta
+from operator import itemgetter
+
+import numpy as np
+
+from .models import Expense
+
+ROLLING_WINDOW = 30
+
+
+def load_columns(rows):
+    """
+    Turns `(id, date, amount, category)` tuples into one NumPy array per
+    column, plus the list of distinct categories.
+
+    Dates become day ordinals and categories indexes into that list, so every
+    array is a plain `int64` one: converting `date` objects to `datetime64`
+    or comparing object arrays of strings costs more than the statistics.
+    """
+
+    labels = {}
+
+    def column(index, convert=None):
+        values = map(itemgetter(index), rows)
+        return np.fromiter(map(convert, values) if convert else values, dtype=np.int64, count=len(rows))
+
+    return (
+        column(0),
+        column(1, date.toordinal),
+        column(2),
+        column(3, lambda category: labels.setdefault(category, len(labels))),
+        list(labels)
+    )
+
+
+def load_expenses(owner, start, end):
+    """
+    Reads the columns the statistics need with a single `values_list` query,
+    including the `ROLLING_WINDOW` days before `start` the first rolling
+    averages are made of.
+    """
+
+    rows = list(Expense.objects.filter(
+        owner=owner,
+        date__gte=start - timedelta(days=ROLLING_WINDOW - 1),
+        date__lte=end
+    ).order_by().values_list('id', 'date', 'amount', 'category'))
+
+    return load_columns(rows)
+
+
+def spending_statistics(ids, days, amounts, categories, labels, start, end, z_threshold=3.0):
+    """
+    Per category statistics of the expenses dated within `start` and `end`:
+    mean, median, 90th/99th percentiles, standard deviation, the records
+    lying more than `z_threshold` standard deviations away from the mean
+    (ordered by date) and the average daily spending over the trailing
+    `ROLLING_WINDOW` days, one value per day of the window.
+
+    Takes the columns built by `load_columns`. Every statistic is computed on
+    whole arrays: the records are sorted by category and date once, so each
+    category is a contiguous slice, and the daily totals of all categories
+    come from a single `bincount`. The only Python level loop is the one over
+    the (handful of) categories.
+    """
+
+    periods = (end - start).days + 1
+    width = periods + ROLLING_WINDOW - 1
+    offsets = days - start.toordinal() + ROLLING_WINDOW - 1
+
+    # Daily totals of every category at once, one row per category.
+    daily = np.bincount(
+        categories * width + offsets,
+        weights=amounts,
+        minlength=len(labels) * width
+    ).reshape(len(labels), width)
+    cumulative = np.pad(np.cumsum(daily, axis=1), ((0, 0), (1, 0)))
+    rolling = np.round((cumulative[:, ROLLING_WINDOW:] - cumulative[:, :-ROLLING_WINDOW]) / ROLLING_WINDOW, 2)
+
+    # Records within the window grouped by category, so each one is a slice,
+    # and ordered by date within it.
+    in_window = offsets >= ROLLING_WINDOW - 1
+    ids, days, amounts, categories = ids[in_window], days[in_window], amounts[in_window], categories[in_window]
+    order = np.lexsort((ids, days, categories))
+    ids, days, amounts = ids[order], days[order], amounts[order]
+    bounds = np.searchsorted(categories[order], np.arange(len(labels) + 1))
+
+    result = {}
+
+    for code, category in sorted(enumerate(labels), key=lambda item: item[1]):
+        group = slice(bounds[code], bounds[code + 1])
+        values = amounts[group]
+        if not values.size:
+            continue
+
+        mean = values.mean()
+        std = values.std()
+        median, p90, p99 = np.percentile(values, [50, 90, 99])
+
+        outlying = np.flatnonzero(np.abs(values - mean) > z_threshold * std) if std else []
+
+        result[category] = {
+            'records': int(values.size),
+            'total': int(values.sum()),
+            'mean': round(float(mean), 2),
+            'median': round(float(median), 2),
+            'p90': round(float(p90), 2),
+            'p99': round(float(p99), 2),
+            'std': round(float(std), 2),
+            'outliers': [
+                {
+                    'id': int(pk),
+                    'date': date.fromordinal(int(day)).isoformat(),
+                    'amount': int(amount),
+                    'z_score': round(float((amount - mean) / std), 2)
+                }
+                for pk, day, amount in zip(ids[group][outlying], days[group][outlying], values[outlying])
+            ],
+            'rolling_30d': rolling[code].tolist(),
+        }
+
+    return result
@@ -0,0 +1,46 @@
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from incomeexpensesapi.rollups import month_of
+
+from .models import Budget, ExpenseMonthlyRollup
+
+
+def with_spending(budgets, month):
+    """
+    Annotates `budgets` with the amount `spent` in their category within
+    `month`, taken from the running total in the monthly rollup rather than
+    summed from the `Expense` table.
+    """
+
+    spent = ExpenseMonthlyRollup.objects.filter(
+        owner=OuterRef('owner'),
+        category=OuterRef('category'),
+        month=month_of(month)
+    ).values('total')[:1]
+
+    return budgets.annotate(spent=Coalesce(Subquery(spent), Value(0)))
+
+
+def budget_status(expense):
+    """
+    Status of the budget `expense` falls under, for the month of `expense`,
+    or `None` if there is no budget for its category. Costs a single lookup
+    of one budget and one rollup row, regardless of how many expenses there are.
+    """
+
+    budget = with_spending(
+        Budget.objects.filter(owner_id=expense.owner_id, category=expense.category),
+        expense.date
+    ).values('amount', 'spent').first()
+
+    if budget is None:
+        return None
+
+    return {
+        'month': month_of(expense.date),
+        'amount': budget['amount'],
+        'spent': budget['spent'],
+        'remaining': budget['amount'] - budget['spent'],
+        'exceeded': budget['spent'] > budget['amount'],
+    }
@@ -0,0 +1,51 @@
+# Generated by Django 4.1 on 2026-10-18 14:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    ExpenseMonthlyRollup = apps.get_model('expenses', 'ExpenseMonthlyRollup')
+
+    rows = Expense.objects.order_by().annotate(
+        month=TruncMonth('date')
+    ).values('owner_id', 'month', 'category').annotate(
+        total=Sum('amount'),
+        records=Count('id')
+    )
+
+    ExpenseMonthlyRollup.objects.bulk_create(
+        (ExpenseMonthlyRollup(**row) for row in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0002_alter_expense_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=[('ONLINE_SERVICES', 'Online Services'), ('TRAVEL', 'Travel'), ('FOOD', 'Food'), ('RENT', 'Rent'), ('OTHER', 'Other')], max_length=50)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='expensemonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'month', 'category'), name='unique_expense_rollup'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
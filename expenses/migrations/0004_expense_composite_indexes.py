@@ -0,0 +1,29 @@
+# Generated by Django 4.1 on 2026-10-18 14:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0003_expensemonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', 'date'], name='expense_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', 'category', 'date', 'amount'], name='expense_owner_category_idx'),
+        ),
+    ]
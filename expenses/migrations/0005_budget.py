@@ -0,0 +1,32 @@
+# Generated by Django 4.1 on 2026-10-18 15:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0004_expense_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('ONLINE_SERVICES', 'Online Services'), ('TRAVEL', 'Travel'), ('FOOD', 'Food'), ('RENT', 'Rent'), ('OTHER', 'Other')], max_length=50)),
+                ('amount', models.PositiveIntegerField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['category'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='budget',
+            constraint=models.UniqueConstraint(fields=('owner', 'category'), name='unique_budget'),
+        ),
+    ]
@@ -15,14 +15,99 @@ class Expense(models.Model):
         ('OTHER', 'Other')
     ]
 
-    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses')
+    # `owner` leads both composite indexes below, a separate FK index would be redundant.
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expenses', db_index=False)
     date = models.DateField()
     description = models.TextField()
     amount = models.PositiveIntegerField(default=0)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
+    # set on the records materialized from a `RecurringExpense` template, indexed
+    # by the unique (recurring, date) constraint below
+    recurring = models.ForeignKey('RecurringExpense', on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='expenses')
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # list views: owner's records ordered by `-date`
+            models.Index(fields=['owner', 'date'], name='expense_owner_date_idx'),
+            # stats views: owner's records of a category within a date range,
+            # `amount` is included so the sums are answered from the index alone
+            models.Index(fields=['owner', 'category', 'date', 'amount'], name='expense_owner_category_idx'),
+        ]
+        constraints = [
+            # a template never materializes the same occurrence twice
+            models.UniqueConstraint(fields=['recurring', 'date'], name='unique_expense_occurrence'),
+        ]
 
     def __str__(self):
         return f"{self.owner.get_full_name()}'s expenses for {self.date}"
+
+
+class ExpenseMonthlyRollup(models.Model):
+    """
+    Running total `amount` and number of `Expense` records of a single owner,
+    month and category. Kept up to date by the write views, so the stats
+    endpoints never have to scan the whole `Expense` table.
+    """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    month = models.DateField() # always the first day of the month
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    total = models.PositiveBigIntegerField(default=0)
+    records = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'month', 'category'], name='unique_expense_rollup')
+        ]
+
+    def __str__(self):
+        return f"{self.category} expenses of {self.owner_id} for {self.month:%Y-%m}"
+
+
+class Budget(models.Model):
+    """
+    Monthly spending limit of a single owner for one `Expense` category.
+    What has been spent against it is read from `ExpenseMonthlyRollup`.
+    """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    amount = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['category']
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'category'], name='unique_budget')
+        ]
+
+    def __str__(self):
+        return f"{self.category} budget of {self.owner_id}"
+
+
+class RecurringExpense(models.Model):
+    """
+    Template of an `Expense` repeating every week or every month. `next_date` is
+    the first occurrence not materialized yet (`None` once past `end_date`),
+    see `materialize_recurring`.
+    """
+
+    FREQUENCY_CHOICES = [
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly')
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_expenses')
+    description = models.TextField()
+    amount = models.PositiveIntegerField(default=0)
+    category = models.CharField(max_length=50, choices=Expense.CATEGORY_CHOICES)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    # monthly templates only, the last day of shorter months is used instead
+    # of a missing 29th-31st, the day of `start_date` by default
+    day_of_month = models.PositiveSmallIntegerField(null=True, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.frequency.lower()} {self.category} expense of {self.owner_id}"
@@ -1,9 +1,43 @@
 from rest_framework import serializers
 
-from .models import Expense
+from incomeexpensesapi.serializers import MAX_AMOUNT, BulkCreateListSerializer, RecurringSerializer
+
+from .models import Budget, Expense, RecurringExpense
 
 class ExpenseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Expense
         fields = ['id', 'date', 'amount', 'description', 'category']
+        extra_kwargs = {'amount': {'min_value': 0, 'max_value': MAX_AMOUNT}}
+        list_serializer_class = BulkCreateListSerializer
+
+class BudgetSerializer(serializers.ModelSerializer):
+
+    spent = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Budget
+        fields = ['id', 'category', 'amount', 'spent']
+        extra_kwargs = {'amount': {'min_value': 0, 'max_value': MAX_AMOUNT}}
+
+    def validate_category(self, value):
+        budgets = Budget.objects.filter(owner=self.context['request'].user, category=value)
+        if self.instance is not None:
+            budgets = budgets.exclude(pk=self.instance.pk)
+        if budgets.exists():
+            raise serializers.ValidationError('There is a budget for this category already.')
+        return value
+
+class RecurringExpenseSerializer(RecurringSerializer):
+
+    class Meta:
+        model = RecurringExpense
+        fields = [
+            'id', 'description', 'amount', 'category', 'frequency', 'day_of_month', 'start_date', 'end_date', 'next_date'
+        ]
+        read_only_fields = ['next_date']
+        extra_kwargs = {
+            'amount': {'min_value': 0, 'max_value': MAX_AMOUNT},
+            'day_of_month': {'min_value': 1, 'max_value': 31},
+        }
@@ -1,3 +1,465 @@
-from django.test import TestCase
+import json
+import random
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError
+from django.db.models import Q
+
+from incomeexpensesapi import recurring, rollups
+from incomeexpensesapi.aggregates import grouped
+from incomeexpensesapi.management.commands.benchmark_analytics import python_statistics
+from incomeexpensesapi.testing import ASGIClient, LedgerAPITestCase
+
+from .analytics import load_columns, spending_statistics
+from .models import Expense, ExpenseMonthlyRollup, RecurringExpense
+from .views import ExpenseExportAPIView
+
+
+class ExpenseStatsTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add(Expense, 100, 'FOOD')
+        self.add(Expense, 50, 'FOOD', days_ago=10)
+        self.add(Expense, 300, 'TRAVEL', days_ago=400)
+        # someone else's
+        self.add(Expense, 1000, 'FOOD', owner=self.create_user('other@example.com'))
+
+    def test_yearly_stats_sum_the_last_year_per_category(self):
+        response = self.client.get('/expenses/yearly-stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'data': {'Summary': {'FOOD': 150}}})
+
+    def test_category_averages(self):
+        response = self.client.get('/expenses/category-averages/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'data': {
+            'FOOD': {'FOOD': 75.0, 'records': 2},
+            'TRAVEL': {'TRAVEL': 300.0, 'records': 1},
+        }})
+
+    def test_stats_need_authentication(self):
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.client.get('/expenses/yearly-stats/').status_code, 401)
+
+
+class ExpenseRollupTests(LedgerAPITestCase):
+
+    def stored_rollups(self):
+        return sorted(ExpenseMonthlyRollup.objects.values_list('owner_id', 'month', 'category', 'total', 'records'))
+
+    def assertRollupsMatchRebuild(self):
+        self.assertEqual(rollups.find_drift(Expense), [])
+        stored = self.stored_rollups()
+        rollups.rebuild(Expense)
+        self.assertEqual(stored, self.stored_rollups())
+
+    def test_writes_keep_the_rollups_in_step(self):
+        today = date.today()
+        created = self.client.post('/expenses/', {
+            'date': today, 'amount': 40, 'description': 'lunch', 'category': 'FOOD'
+        }).json()
+        self.client.post('/expenses/', {'date': today, 'amount': 60, 'description': 'dinner', 'category': 'FOOD'})
+        self.assertEqual(self.stored_rollups(), [(self.user.id, today.replace(day=1), 'FOOD', 100, 2)])
+
+        # moved to another month and category
+        self.client.patch(f"/expenses/{created['id']}/", {
+            'date': today - timedelta(days=62), 'amount': 45, 'category': 'TRAVEL'
+        })
+        self.assertRollupsMatchRebuild()
+
+        self.client.delete(f"/expenses/{created['id']}/")
+        self.assertRollupsMatchRebuild()
+        self.assertFalse(ExpenseMonthlyRollup.objects.filter(category='TRAVEL').exists())
+
+    def test_batch_create_merges_deltas_per_rollup_row(self):
+        today = date.today()
+        response = self.client.post('/expenses/batch/', [
+            {'date': today, 'amount': amount, 'description': 'rent', 'category': 'RENT'} for amount in (1, 2, 3)
+        ], format='json')
+
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.stored_rollups(), [(self.user.id, today.replace(day=1), 'RENT', 6, 3)])
+        self.assertRollupsMatchRebuild()
+
+    def test_amounts_beyond_the_column_range_are_rejected(self):
+        response = self.client.post('/expenses/', {
+            'date': date.today(), 'amount': 2 ** 31, 'description': 'typo', 'category': 'FOOD'
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.json())
+        self.assertFalse(ExpenseMonthlyRollup.objects.exists())
+
+    def test_find_drift_reports_rows_out_of_step(self):
+        self.add(Expense, 10, 'FOOD')
+        ExpenseMonthlyRollup.objects.update(total=11)
+
+        self.assertEqual(rollups.find_drift(Expense), [(self.user.id, date.today().replace(day=1), 'FOOD')])
+        rollups.rebuild(Expense)
+        self.assertEqual(rollups.find_drift(Expense), [])
+
+
+class ExpenseIndexTests(LedgerAPITestCase):
+
+    def test_list_reads_the_owner_date_index(self):
+        plan = Expense.objects.filter(owner=self.user).order_by('-date').explain()
+
+        self.assertIn('expense_owner_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_stats_edges_are_answered_from_the_covering_index(self):
+        today = date.today()
+        edges = Q(date__gte=today - timedelta(days=20), date__lte=today)
+
+        plan = grouped(Expense.objects.filter(edges, owner=self.user), 'category').explain()
+
+        self.assertIn('COVERING INDEX expense_owner_category_idx', plan)
+
+
+class ExpenseCursorPaginationTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # several records a day, so pages end in the middle of a date
+        self.expected = [
+            expense.id for expense in sorted(
+                (self.add(Expense, 1, 'FOOD', days_ago=i // 4) for i in range(25)),
+                key=lambda expense: (expense.date, expense.id), reverse=True
+            )
+        ]
+
+    def walk(self, url, direction):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertNotIn('count', body)
+            pages.append([record['id'] for record in body['results']])
+            url = body[direction]
+        return pages
+
+    def test_following_next_links_lists_every_record_once(self):
+        pages = self.walk('/expenses/?pagination=cursor', 'next')
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_following_previous_links_comes_back_to_the_first_page(self):
+        last = self.client.get('/expenses/?pagination=cursor').json()
+        while last['next']:
+            last = self.client.get(last['next']).json()
+
+        pages = self.walk(last['previous'], 'previous')
+
+        self.assertEqual(sum(reversed(pages), []), self.expected[:20])
+
+    def test_records_added_meanwhile_dont_shift_the_pages(self):
+        first = self.client.get('/expenses/?pagination=cursor').json()
+        self.add(Expense, 1, 'FOOD')
+
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual([record['id'] for record in second['results']], self.expected[10:20])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/expenses/?cursor=garbage').status_code, 404)
+
+    def test_page_numbers_are_still_the_default(self):
+        body = self.client.get('/expenses/?page=3').json()
+
+        self.assertEqual(body['count'], 25)
+        self.assertEqual(len(body['results']), 5)
+
+
+class ExpenseExportTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.expenses = [self.add(Expense, amount, 'FOOD', days_ago=amount) for amount in (1, 2, 3, 4, 5)]
+        self.add(Expense, 6, 'FOOD', owner=self.create_user('other@example.com'))
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode() if response.streaming else response.content.decode()
+
+    def test_streams_every_record_as_csv(self):
+        # chunks end in the middle of the export
+        with mock.patch.object(ExpenseExportAPIView, 'chunk_size', 2):
+            response = self.client.get('/expenses/export/')
+            rows = self.content(response).splitlines()
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="expenses.csv"')
+        self.assertEqual(rows[0], 'id,date,amount,description,category')
+        self.assertEqual([int(row.split(',')[2]) for row in rows[1:]], [1, 2, 3, 4, 5])
+
+    def test_limits_ndjson_to_the_date_range(self):
+        start = (date.today() - timedelta(days=4)).isoformat()
+        end = (date.today() - timedelta(days=2)).isoformat()
+
+        response = self.client.get(f'/expenses/export/?output=ndjson&start={start}&end={end}')
+
+        records = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([record['id'] for record in records], [expense.id for expense in self.expenses[1:4]])
+        self.assertEqual(records[0]['date'], end)
+
+    def test_rejects_unknown_outputs(self):
+        self.assertEqual(self.client.get('/expenses/export/?output=xlsx').status_code, 400)
+
+    async def test_exports_over_asgi(self):
+        response = await ASGIClient().get('/expenses/export/', authorization=self.bearer())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(self.content(response).splitlines()), 6)
+
+
+class ExpenseStatsCacheTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add(Expense, 100, 'FOOD')
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        first = self.client.get('/expenses/category-averages/')
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/expenses/category-averages/')
+
+        self.assertEqual(second.json(), first.json())
+
+    def test_writes_invalidate_the_cached_stats(self):
+        self.client.get('/expenses/category-averages/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/expenses/', {'date': date.today(), 'amount': 50, 'description': 'x', 'category': 'FOOD'})
+
+        response = self.client.get('/expenses/category-averages/')
+        self.assertEqual(response.json()['data']['FOOD'], {'FOOD': 75.0, 'records': 2})
+
+    def test_users_dont_share_entries(self):
+        self.client.get('/expenses/category-averages/')
+
+        self.client.force_authenticate(self.create_user('other@example.com'))
+        response = self.client.get('/expenses/category-averages/')
+
+        self.assertEqual(response.json(), {'data': {}})
+
+
+class ExpenseTimeSeriesTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for day, amount, category in [
+            (date(2022, 1, 10), 1, 'FOOD'),  # before the window
+            (date(2022, 1, 20), 2, 'FOOD'),
+            (date(2022, 2, 5), 4, 'FOOD'),
+            (date(2022, 2, 25), 8, 'RENT'),
+            (date(2022, 4, 5), 16, 'FOOD'),
+            (date(2022, 4, 20), 32, 'FOOD'),  # after the window
+        ]:
+            self.add(Expense, amount, category, day=day)
+
+    def series(self, query):
+        response = self.client.get(f'/expenses/timeseries/?start=2022-01-15&end=2022-04-10&{query}')
+        self.assertEqual(response.status_code, 200)
+        return [(entry['period'], entry['total'], entry['records']) for entry in response.json()['data']['series']]
+
+    def test_monthly_totals_are_zero_filled(self):
+        self.assertEqual(self.series('granularity=month'), [
+            ('2022-01-01', 2, 1), ('2022-02-01', 12, 2), ('2022-03-01', 0, 0), ('2022-04-01', 16, 1),
+        ])
+
+    def test_weeks_start_on_monday(self):
+        series = self.series('granularity=week')
+
+        self.assertEqual(series[0], ('2022-01-10', 0, 0))
+        self.assertEqual(series[-1], ('2022-04-04', 16, 1))
+        self.assertEqual(sum(total for _, total, _ in series), 30)
+
+    def test_daily_and_yearly_totals_agree(self):
+        days = self.series('granularity=day')
+
+        self.assertEqual(len(days), 86)
+        self.assertEqual(self.series('granularity=year'), [('2022-01-01', 30, 4)])
+        self.assertEqual(sum(total for _, total, _ in days), 30)
+
+    def test_filters_by_category(self):
+        self.assertEqual([total for _, total, _ in self.series('granularity=month&category=RENT')], [0, 8, 0, 0])
+
+    def test_rejects_invalid_windows(self):
+        for query in ('category=CAKE', 'granularity=hour', 'granularity=day&start=2000-01-01', 'start=2022-05-01'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/expenses/timeseries/?end=2022-04-10&{query}').status_code, 400)
+
+
+class SpendingAnalyticsTests(LedgerAPITestCase):
+
+    def test_describes_each_category(self):
+        start = date(2022, 3, 1)
+        for offset in range(9):
+            self.add(Expense, 10, 'FOOD', day=start + timedelta(days=offset))
+        spike = self.add(Expense, 100, 'FOOD', day=date(2022, 3, 20))
+        self.add(Expense, 1000, 'FOOD', day=date(2022, 2, 27))  # only counts towards the rolling average
+
+        response = self.client.get('/expenses/analytics/?start=2022-03-01&end=2022-03-31&z=2.5')
+
+        self.assertEqual(response.status_code, 200)
+        food = response.json()['data']['categories']['FOOD']
+        self.assertEqual(
+            {key: food[key] for key in ('records', 'total', 'mean', 'median', 'p90', 'p99', 'std')},
+            {'records': 10, 'total': 190, 'mean': 19.0, 'median': 10.0, 'p90': 19.0, 'p99': 91.9, 'std': 27.0}
+        )
+        self.assertEqual(food['outliers'], [{'id': spike.id, 'date': '2022-03-20', 'amount': 100, 'z_score': 3.0}])
+        self.assertEqual(len(food['rolling_30d']), 31)
+        self.assertEqual(food['rolling_30d'][0], round(1010 / 30, 2))
+
+    def test_matches_the_pure_python_statistics(self):
+        rnd = random.Random(0)
+        start, end = date(2021, 1, 1), date(2021, 12, 31)
+        rows = [
+            (pk, start + timedelta(days=rnd.randint(-29, 364)), rnd.randint(1, 500), rnd.choice(['FOOD', 'RENT', 'TRAVEL']))
+            for pk in range(1, 2001)
+        ]
+
+        self.assertEqual(spending_statistics(*load_columns(rows), start, end), python_statistics(rows, start, end))
+
+    def test_rejects_windows_over_ten_years(self):
+        self.assertEqual(self.client.get('/expenses/analytics/?start=2000-01-01&end=2022-01-01').status_code, 400)
+        self.assertEqual(self.client.get('/expenses/analytics/?z=many').status_code, 400)
+
+
+class BudgetTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.budget = self.client.post('/expenses/budgets/', {'category': 'FOOD', 'amount': 100}).json()
+
+    def spend(self, amount, category='FOOD', day=None):
+        return self.client.post('/expenses/', {
+            'date': day or date.today(), 'amount': amount, 'description': 'groceries', 'category': category
+        }).json()
+
+    def test_expense_writes_report_the_budget_status(self):
+        self.assertEqual(self.spend(60)['budget'], {
+            'month': date.today().replace(day=1).isoformat(),
+            'amount': 100, 'spent': 60, 'remaining': 40, 'exceeded': False
+        })
+
+        expense = self.spend(50)
+        self.assertEqual((expense['budget']['spent'], expense['budget']['exceeded']), (110, True))
+
+        updated = self.client.patch(f"/expenses/{expense['id']}/", {'amount': 10}).json()
+        self.assertEqual(updated['budget']['remaining'], 30)
+
+        self.assertIsNone(self.spend(5, category='RENT')['budget'])
+
+    def test_budgets_list_the_spending_of_the_month(self):
+        self.spend(30)
+        self.spend(20, day=date.today().replace(day=1) - timedelta(days=1))
+
+        this_month = self.client.get('/expenses/budgets/').json()['results']
+        last_month = self.client.get(
+            f"/expenses/budgets/?month={date.today().replace(day=1) - timedelta(days=1)}"
+        ).json()['results']
+
+        self.assertEqual([(budget['category'], budget['spent']) for budget in this_month], [('FOOD', 30)])
+        self.assertEqual([budget['spent'] for budget in last_month], [20])
+
+    def test_one_budget_per_category(self):
+        response = self.client.post('/expenses/budgets/', {'category': 'FOOD', 'amount': 5})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category', response.json())
+
+    def test_budgets_are_private(self):
+        self.client.force_authenticate(self.create_user('other@example.com'))
+
+        self.assertEqual(self.client.get(f"/expenses/budgets/{self.budget['id']}/").status_code, 404)
+        self.assertEqual(self.client.get('/expenses/budgets/').json()['results'], [])
+
+
+class MaterializeRecurringTests(LedgerAPITestCase):
+
+    until = date(2022, 6, 30)
+
+    def template(self, frequency, start_date, **fields):
+        response = self.client.post('/expenses/recurring/', {
+            'description': 'subscription', 'amount': 10, 'category': 'ONLINE_SERVICES',
+            'frequency': frequency, 'start_date': start_date, **fields
+        })
+        self.assertEqual(response.status_code, 201)
+        return RecurringExpense.objects.get(id=response.json()['id'])
+
+    def materialize(self, **options):
+        return list(recurring.materialize(RecurringExpense, self.until, **options))[-1]
+
+    def occurrences(self, template):
+        return list(Expense.objects.filter(recurring=template).order_by('date').values_list('date', flat=True))
+
+    def test_reruns_create_nothing_new(self):
+        monthly = self.template('MONTHLY', date(2022, 1, 31))
+        weekly = self.template('WEEKLY', date(2022, 6, 1), end_date=date(2022, 6, 20))
+
+        self.assertEqual(self.materialize(), {'templates': 2, 'created': 9, 'skipped': 0})
+        self.assertEqual(list(recurring.materialize(RecurringExpense, self.until)), [])
+
+        self.assertEqual(self.occurrences(monthly), [
+            date(2022, 1, 31), date(2022, 2, 28), date(2022, 3, 31), date(2022, 4, 30), date(2022, 5, 31),
+            date(2022, 6, 30),
+        ])
+        self.assertEqual(self.occurrences(weekly), [date(2022, 6, 1), date(2022, 6, 8), date(2022, 6, 15)])
+        monthly.refresh_from_db()
+        weekly.refresh_from_db()
+        self.assertEqual((monthly.next_date, weekly.next_date), (date(2022, 7, 31), None))
+        self.assertEqual(rollups.find_drift(Expense), [])
+
+    def test_long_overdue_templates_are_split_across_chunks(self):
+        old = self.template('WEEKLY', date(2000, 1, 3))
+        new = self.template('MONTHLY', date(2022, 6, 1))
+
+        progress = list(recurring.materialize(RecurringExpense, self.until, max_records=100))
+
+        self.assertEqual([chunk['created'] for chunk in progress], list(range(100, 1200, 100)) + [1175])
+        self.assertEqual(progress[-1], {'templates': 2, 'created': 1175, 'skipped': 0})
+        self.assertEqual(len(set(self.occurrences(old))), 1174)
+        self.assertEqual(self.occurrences(new), [date(2022, 6, 1)])
+
+    def test_occurrences_written_meanwhile_are_left_out(self):
+        template = self.template('MONTHLY', date(2022, 5, 1))
+        # as if a concurrent run got there first
+        Expense.objects.create(
+            owner=self.user, recurring=template, date=date(2022, 6, 1), amount=10, description='', category='ONLINE_SERVICES'
+        )
+
+        self.assertEqual(self.materialize()['created'], 1)
+        self.assertEqual(self.occurrences(template), [date(2022, 5, 1), date(2022, 6, 1)])
+
+    def test_templates_that_keep_failing_are_skipped(self):
+        good = self.template('MONTHLY', date(2022, 6, 1))
+        bad = self.template('MONTHLY', date(2022, 6, 2))
+        bulk_create = Expense.objects.bulk_create
+
+        def failing_bulk_create(records, **kwargs):
+            if any(record.recurring_id == bad.id for record in records):
+                raise IntegrityError('CHECK constraint failed')
+            return bulk_create(records, **kwargs)
+
+        with mock.patch.object(Expense.objects, 'bulk_create', side_effect=failing_bulk_create) as patched, \
+                self.assertLogs('incomeexpensesapi.recurring', 'WARNING') as logs:
+            progress = self.materialize()
+
+        self.assertEqual(progress, {'templates': 1, 'created': 1, 'skipped': 1})
+        # 3 tries of both, then 3 of the bad one alone, after the good one
+        self.assertEqual(patched.call_count, 7)
+        self.assertIn(f'Skipping recurring expense {bad.id}', logs.output[0])
+        self.assertEqual(self.occurrences(good), [date(2022, 6, 1)])
+        bad.refresh_from_db()
+        self.assertEqual(bad.next_date, date(2022, 6, 2))
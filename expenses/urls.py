@@ -1,11 +1,20 @@
 from django.urls import path
+
 from . import views
 
 app_name = 'expenses'
 
 urlpatterns = [
     path('', views.ExpenseListAPIView.as_view(), name='list-create'),
+    path('batch/', views.ExpenseBatchCreateAPIView.as_view(), name='batch-create'),
+    path('export/', views.ExpenseExportAPIView.as_view(), name='export'),
     path('<int:id>/', views.ExpenseDetailAPIView.as_view(), name='single'),
+    path('budgets/', views.BudgetListAPIView.as_view(), name='budgets'),
+    path('budgets/<int:id>/', views.BudgetDetailAPIView.as_view(), name='budget'),
+    path('recurring/', views.RecurringExpenseListAPIView.as_view(), name='recurring'),
+    path('recurring/<int:id>/', views.RecurringExpenseDetailAPIView.as_view(), name='recurring-single'),
     path('yearly-stats/', views.YearlyExpense.as_view(), name='yearly-stats'),
-    path('category-averages/', views.CategoriesAverage.as_view(), name='category-averages')
+    path('category-averages/', views.CategoriesAverage.as_view(), name='category-averages'),
+    path('timeseries/', views.ExpenseTimeSeries.as_view(), name='timeseries'),
+    path('analytics/', views.SpendingAnalytics.as_view(), name='analytics')
 ]
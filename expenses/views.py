@@ -1,21 +1,60 @@
 from django.shortcuts import render
 
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+
 from incomeexpensesapi.renderers import DefaultRenderer
 from incomeexpensesapi.permissions import IsOwner
+from incomeexpensesapi.caching import cache_per_user, conditional_get
+from incomeexpensesapi.exports import LedgerExportAPIView
+from incomeexpensesapi.mixins import LedgerWriteMixin
+from incomeexpensesapi.pagination import LedgerPagination
+from incomeexpensesapi.rollups import summarize_all, summarize_window
+from incomeexpensesapi.timeseries import TimeSeriesAPIView
+from incomeexpensesapi.utils import get_date_param
 
-from .serializers import ExpenseSerializer
+from . import analytics
+from .budgets import budget_status, with_spending
+from .serializers import BudgetSerializer, ExpenseSerializer, RecurringExpenseSerializer
 
-from .models import Expense
+from .models import Budget, Expense, RecurringExpense
 
 from datetime import datetime, date, timedelta
 
 # Create your views here.
 
-class ExpenseListAPIView(generics.ListCreateAPIView):
+class BudgetStatusMixin:
+    """
+    Adds the status of the budget a created or updated `Expense` falls under
+    to the response (`budget`, `null` when its category has no budget).
+    """
+
+    def perform_create(self, serializer):
+        instance = super().perform_create(serializer)
+        self.budget = budget_status(instance)
+        return instance
+
+    def perform_update(self, serializer):
+        instance = super().perform_update(serializer)
+        self.budget = budget_status(instance)
+        return instance
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data['budget'] = self.budget
+        return response
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        response.data['budget'] = self.budget
+        return response
+
+class ExpenseListAPIView(BudgetStatusMixin, LedgerWriteMixin, generics.ListCreateAPIView):
     """
     Endpoint for listing all `Expense` entries or creating new ones based on
     a request type (`GET`/`POST`).
@@ -24,14 +63,35 @@ class ExpenseListAPIView(generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated,]
     queryset = Expense.objects.all()
+    pagination_class = LedgerPagination
 
     def get_queryset(self):
         return self.queryset.filter(owner=self.request.user)
 
-    def perform_create(self, serializer):
-        return serializer.save(owner=self.request.user)
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class ExpenseBatchCreateAPIView(LedgerWriteMixin, generics.GenericAPIView):
+    """
+    Creates up to `max_batch_size` `Expense` entries sent as a list in a single
+    `POST`, e.g. when syncing entries captured offline. Either every entry gets
+    saved, or none is and the response lists the errors of each entry.
+    """
+
+    serializer_class = ExpenseSerializer
+    permission_classes = [permissions.IsAuthenticated,]
+    max_batch_size = 5000
+
+    @swagger_auto_schema(request_body=ExpenseSerializer(many=True), responses={201: ExpenseSerializer(many=True)})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False, max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class ExpenseDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ExpenseDetailAPIView(BudgetStatusMixin, LedgerWriteMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Endpoint for viewing single `Expense` entries, and also updating or deleting them.
     (`GET`/`PUT`/`PATCH`/`DELETE`)
@@ -45,6 +105,97 @@ class ExpenseDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return self.queryset.filter(owner=self.request.user)
 
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class BudgetMixin:
+    """
+    Budgets of the current user, with the amount `spent` against each of them
+    within `month` (any day of it, the current month by default).
+    """
+
+    serializer_class = BudgetSerializer
+    queryset = Budget.objects.all()
+
+    def get_queryset(self):
+        month = get_date_param(self.request, 'month', date.today())
+        return with_spending(self.queryset.filter(owner=self.request.user), month)
+
+    def perform_create(self, serializer):
+        instance = serializer.save(owner=self.request.user)
+        serializer.instance = self.get_queryset().get(pk=instance.pk)
+
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=instance.pk)
+
+class BudgetListAPIView(BudgetMixin, generics.ListCreateAPIView):
+    """
+    Endpoint for listing the monthly `Budget` of each category or setting new
+    ones (`GET`/`POST`).
+    """
+
+    permission_classes = [permissions.IsAuthenticated,]
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('month', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+    ])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class BudgetDetailAPIView(BudgetMixin, generics.RetrieveUpdateDestroyAPIView):
+    """
+    Endpoint for viewing, changing or removing a single `Budget`.
+    (`GET`/`PUT`/`PATCH`/`DELETE`)
+    """
+
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+    lookup_field = 'id'
+
+
+class RecurringExpenseListAPIView(generics.ListCreateAPIView):
+    """
+    Endpoint for listing the `RecurringExpense` templates or creating new ones
+    (`GET`/`POST`). Their occurrences are created by `materialize_recurring`.
+    """
+
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [permissions.IsAuthenticated,]
+    queryset = RecurringExpense.objects.all()
+
+    def get_queryset(self):
+        return self.queryset.filter(owner=self.request.user).order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+class RecurringExpenseDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    Endpoint for viewing, changing or removing a single `RecurringExpense`
+    template. Expenses already created from it are kept.
+    (`GET`/`PUT`/`PATCH`/`DELETE`)
+    """
+
+    serializer_class = RecurringExpenseSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+    queryset = RecurringExpense.objects.all()
+    lookup_field = 'id'
+
+    def get_queryset(self):
+        return self.queryset.filter(owner=self.request.user)
+
+
+class ExpenseExportAPIView(LedgerExportAPIView):
+    """
+    Streams all of the user's `Expense` entries as CSV or NDJSON.
+    """
+
+    model = Expense
+    fields = ['id', 'date', 'amount', 'description', 'category']
+    filename = 'expenses'
+
 
 class YearlyExpense(APIView):
     """
@@ -54,30 +205,16 @@ class YearlyExpense(APIView):
     permission_classes = [permissions.IsAuthenticated, ]
     renderer_classes = [DefaultRenderer, ]
 
-    def get_category_items(self, items, category):
-        return items.filter(category=category)
-
-    def calculate_category_total(self, items):
-        return sum([int(i.amount) for i in items])
-
+    @conditional_get
+    @cache_per_user
     def get(self, request):
 
         today = date.today()
         year_ago = today - timedelta(days=365)
 
-        qs = Expense.objects.filter(
-            owner=request.user,
-            date__gte=year_ago,
-            date__lte=today
-        )
+        summary = summarize_window(Expense, request.user, year_ago, today)
 
-        categories = list(set([i.category for i in qs]))
-
-        final = {}
-
-        for category in categories:
-            items = self.get_category_items(qs, category)
-            final[category] = self.calculate_category_total(items)
+        final = {category: totals.total for category, totals in summary.items() if totals.count}
 
         return Response({
             'Summary': final
@@ -92,19 +229,62 @@ class CategoriesAverage(APIView):
     permission_classes = [permissions.IsAuthenticated,]
     renderer_classes = [DefaultRenderer,]
 
-    def get_category_average(self, queryset, category):
-        qs = queryset.filter(
-            category=category
-        )
+    @conditional_get
+    @cache_per_user
+    def get(self, request):
+
+        summary = summarize_all(Expense, request.user)
+
+        final = {category:{category:totals.average, 'records': totals.count} for category, totals in summary.items()}
 
-        avg = round(float(sum([i.amount for i in qs]) / len(qs)), 2)
-        return avg
+        return Response(final, status=status.HTTP_200_OK)
 
+
+class SpendingAnalytics(APIView):
+    """
+    Gets distribution statistics of the `Expense` amounts of each category within
+    `start` and `end` (the last 365 days by default): mean, median, 90th and 99th
+    percentiles, standard deviation, outliers (further than `z` standard deviations
+    from the mean, 3 by default) and the 30-day rolling average of daily spending.
+    """
+
+    permission_classes = [permissions.IsAuthenticated,]
+    renderer_classes = [DefaultRenderer,]
+    max_days = 3660
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('start', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        openapi.Parameter('end', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        openapi.Parameter('z', in_=openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
+    ])
+    @conditional_get
+    @cache_per_user
     def get(self, request):
 
-        expenses = Expense.objects.filter(owner=request.user)
-        categories = list(set([i.category for i in expenses]))
+        end = get_date_param(request, 'end', date.today())
+        start = get_date_param(request, 'start', end - timedelta(days=365))
+        if start > end or (end - start).days >= self.max_days:
+            raise ValidationError({'start': [f'Must be before `end`, by at most {self.max_days} days.']})
 
-        final = {category:{category:self.get_category_average(expenses, category), 'records': expenses.filter(category=category).count()} for category in categories}
+        try:
+            z_threshold = float(request.query_params.get('z', 3))
+        except ValueError:
+            raise ValidationError({'z': ['A number is required.']})
 
-        return Response(final, status=status.HTTP_200_OK)
+        columns = analytics.load_expenses(request.user, start, end)
+
+        return Response({
+            'start': start,
+            'end': end,
+            'categories': analytics.spending_statistics(*columns, start, end, z_threshold=z_threshold)
+        }, status=status.HTTP_200_OK)
+
+
+class ExpenseTimeSeries(TimeSeriesAPIView):
+    """
+    Gets total `amount` spent per day, week, month or year within any date range,
+    optionally for a single `Expense` category.
+    """
+
+    model = Expense
+    key_field = 'category'
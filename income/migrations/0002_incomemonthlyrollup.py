@@ -0,0 +1,51 @@
+# Generated by Django 4.1 on 2026-10-18 14:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    Income = apps.get_model('income', 'Income')
+    IncomeMonthlyRollup = apps.get_model('income', 'IncomeMonthlyRollup')
+
+    rows = Income.objects.order_by().annotate(
+        month=TruncMonth('date')
+    ).values('owner_id', 'month', 'source').annotate(
+        total=Sum('amount'),
+        records=Count('id')
+    )
+
+    IncomeMonthlyRollup.objects.bulk_create(
+        (IncomeMonthlyRollup(**row) for row in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('income', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncomeMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('source', models.CharField(choices=[('SALARY', 'Salary'), ('BUSINESS', 'Business'), ('HUSTLE', 'Hustle'), ('OTHER', 'Other')], max_length=40)),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='income_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='incomemonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'month', 'source'), name='unique_income_rollup'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
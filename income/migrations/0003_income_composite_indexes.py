@@ -0,0 +1,29 @@
+# Generated by Django 4.1 on 2026-10-18 14:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('income', '0002_incomemonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='income',
+            name='owner',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['owner', 'date'], name='income_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['owner', 'source', 'date', 'amount'], name='income_owner_source_idx'),
+        ),
+    ]
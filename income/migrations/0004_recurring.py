@@ -0,0 +1,44 @@
+# Generated by Django 4.1 on 2026-10-18 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('income', '0003_income_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringIncome',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('amount', models.PositiveIntegerField(default=0)),
+                ('source', models.CharField(choices=[('SALARY', 'Salary'), ('BUSINESS', 'Business'), ('HUSTLE', 'Hustle'), ('OTHER', 'Other')], max_length=40)),
+                ('frequency', models.CharField(choices=[('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly')], max_length=10)),
+                ('day_of_month', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('next_date', models.DateField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recurringincome',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_income', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='recurring',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='income', to='income.recurringincome'),
+        ),
+        migrations.AddConstraint(
+            model_name='income',
+            constraint=models.UniqueConstraint(fields=('recurring', 'date'), name='unique_income_occurrence'),
+        ),
+    ]
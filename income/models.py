@@ -14,14 +14,79 @@ class Income(models.Model):
         ('OTHER', 'Other')
     )
 
-    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # `owner` leads both composite indexes below, a separate FK index would be redundant.
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     amount = models.PositiveIntegerField(default=0)
     description = models.TextField()
     source = models.CharField(max_length=40, choices=SOURCE_CHOICES)
     date = models.DateField()
+    # set on the records materialized from a `RecurringIncome` template, indexed
+    # by the unique (recurring, date) constraint below
+    recurring = models.ForeignKey('RecurringIncome', on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='income')
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # list views: owner's records ordered by `-date`
+            models.Index(fields=['owner', 'date'], name='income_owner_date_idx'),
+            # stats views: owner's records of a source within a date range,
+            # `amount` is included so the sums are answered from the index alone
+            models.Index(fields=['owner', 'source', 'date', 'amount'], name='income_owner_source_idx'),
+        ]
+        constraints = [
+            # a template never materializes the same occurrence twice
+            models.UniqueConstraint(fields=['recurring', 'date'], name='unique_income_occurrence'),
+        ]
 
     def __str__(self):
         return f"{self.owner.get_full_name()}'s income for {self.date}"
+
+
+class IncomeMonthlyRollup(models.Model):
+    """
+    Running total `amount` and number of `Income` records of a single owner,
+    month and source. Kept up to date by the write views, so the stats
+    endpoints never have to scan the whole `Income` table.
+    """
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='income_rollups')
+    month = models.DateField() # always the first day of the month
+    source = models.CharField(max_length=40, choices=Income.SOURCE_CHOICES)
+    total = models.PositiveBigIntegerField(default=0)
+    records = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'month', 'source'], name='unique_income_rollup')
+        ]
+
+    def __str__(self):
+        return f"{self.source} income of {self.owner_id} for {self.month:%Y-%m}"
+
+
+class RecurringIncome(models.Model):
+    """
+    Template of an `Income` repeating every week or every month. `next_date` is
+    the first occurrence not materialized yet (`None` once past `end_date`),
+    see `materialize_recurring`.
+    """
+
+    FREQUENCY_CHOICES = [
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly')
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_income')
+    description = models.TextField()
+    amount = models.PositiveIntegerField(default=0)
+    source = models.CharField(max_length=40, choices=Income.SOURCE_CHOICES)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    # monthly templates only, the last day of shorter months is used instead
+    # of a missing 29th-31st, the day of `start_date` by default
+    day_of_month = models.PositiveSmallIntegerField(null=True, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.frequency.lower()} {self.source} income of {self.owner_id}"
@@ -1,9 +1,26 @@
 from rest_framework import serializers
 
-from .models import Income
+from incomeexpensesapi.serializers import MAX_AMOUNT, BulkCreateListSerializer, RecurringSerializer
+
+from .models import Income, RecurringIncome
 
 class IncomeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Income
         fields = ['id', 'date', 'source', 'description', 'amount']
+        extra_kwargs = {'amount': {'min_value': 0, 'max_value': MAX_AMOUNT}}
+        list_serializer_class = BulkCreateListSerializer
+
+class RecurringIncomeSerializer(RecurringSerializer):
+
+    class Meta:
+        model = RecurringIncome
+        fields = [
+            'id', 'description', 'amount', 'source', 'frequency', 'day_of_month', 'start_date', 'end_date', 'next_date'
+        ]
+        read_only_fields = ['next_date']
+        extra_kwargs = {
+            'amount': {'min_value': 0, 'max_value': MAX_AMOUNT},
+            'day_of_month': {'min_value': 1, 'max_value': 31},
+        }
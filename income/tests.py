@@ -1,3 +1,143 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db.models import Q
+
+from asgiref.sync import sync_to_async
+
+from incomeexpensesapi.aggregates import grouped
+from incomeexpensesapi.testing import ASGIClient, LedgerAPITestCase
+
+from .models import Income, IncomeMonthlyRollup
+from .views import IncomeBatchCreate
+
+
+class IncomeStatsTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add(Income, 3000, 'SALARY')
+        self.add(Income, 1000, 'SALARY', days_ago=30)
+        self.add(Income, 500, 'HUSTLE', days_ago=500)
+
+    def test_yearly_stats_list_every_source(self):
+        response = self.client.get('/income/yearly-stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'data': {'SALARY': 4000, 'HUSTLE': 0}})
+
+    def test_source_averages(self):
+        response = self.client.get('/income/source-averages/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'data': {
+            'SALARY': {'amount': 2000.0, 'records': 2},
+            'HUSTLE': {'amount': 500.0, 'records': 1},
+        }})
+
+
+class IncomeIndexTests(LedgerAPITestCase):
+
+    def test_list_reads_the_owner_date_index(self):
+        plan = Income.objects.filter(owner=self.user).order_by('-date').explain()
+
+        self.assertIn('income_owner_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_stats_edges_are_answered_from_the_covering_index(self):
+        today = date.today()
+        edges = Q(date__gte=today - timedelta(days=20), date__lte=today)
+
+        plan = grouped(Income.objects.filter(edges, owner=self.user), 'source').explain()
+
+        self.assertIn('COVERING INDEX income_owner_source_idx', plan)
+
+
+class IncomeBatchCreateTests(LedgerAPITestCase):
+
+    def entries(self, *amounts):
+        return [
+            {'date': date.today(), 'amount': amount, 'description': 'gig', 'source': 'HUSTLE'} for amount in amounts
+        ]
+
+    def test_saves_every_entry_at_once(self):
+        response = self.client.post('/income/batch/', self.entries(10, 20), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([entry['amount'] for entry in response.json()], [10, 20])
+        self.assertEqual(Income.objects.filter(owner=self.user).count(), 2)
+        self.assertEqual(IncomeMonthlyRollup.objects.get(owner=self.user).total, 30)
+
+    def test_saves_nothing_when_an_entry_is_invalid(self):
+        response = self.client.post('/income/batch/', self.entries(10, -5), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('amount', response.json()[1])
+        self.assertFalse(Income.objects.exists())
+        self.assertFalse(IncomeMonthlyRollup.objects.exists())
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.client.post('/income/batch/', [], format='json').status_code, 400)
+
+        with mock.patch.object(IncomeBatchCreate, 'max_batch_size', 2):
+            response = self.client.post('/income/batch/', self.entries(1, 2, 3), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Income.objects.exists())
+
+
+class IncomeConditionalGetTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add(Income, 3000, 'SALARY')
+        self.first = self.client.get('/income/source-averages/')
+
+    def test_unchanged_stats_are_not_sent_again(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/income/source-averages/', HTTP_IF_NONE_MATCH=self.first['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.first['ETag'])
+
+        response = self.client.get('/income/source-averages/', HTTP_IF_MODIFIED_SINCE=self.first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/income/', {'date': date.today(), 'amount': 1, 'description': 'x', 'source': 'SALARY'})
+
+        response = self.client.get('/income/source-averages/', HTTP_IF_NONE_MATCH=self.first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.first['ETag'])
+
+    def test_etags_differ_per_url_and_user(self):
+        self.assertNotEqual(self.client.get('/income/yearly-stats/')['ETag'], self.first['ETag'])
+
+        self.client.force_authenticate(self.create_user('other@example.com'))
+        response = self.client.get('/income/source-averages/', HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class IncomeOverASGITests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for days_ago in range(12):
+            self.add(Income, 100, 'SALARY', days_ago=days_ago)
+        self.async_client = ASGIClient()
+
+    async def test_answer_like_over_wsgi(self):
+        for path in ('/income/source-averages/', '/income/yearly-stats/', '/income/?page=2', '/income/?pagination=cursor'):
+            with self.subTest(path=path):
+                response = await self.async_client.get(path, authorization=self.bearer())
+                expected = await sync_to_async(self.client.get)(path)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+    async def test_need_authentication(self):
+        response = await self.async_client.get('/income/yearly-stats/')
+        self.assertEqual(response.status_code, 401)
@@ -6,7 +6,12 @@ app_name = 'income'
 
 urlpatterns = [
     path('', views.IncomeList.as_view(), name='list-create'),
+    path('batch/', views.IncomeBatchCreate.as_view(), name='batch-create'),
+    path('export/', views.IncomeExport.as_view(), name='export'),
     path('<int:id>/', views.IncomeDetail.as_view(), name='rud'),
+    path('recurring/', views.RecurringIncomeList.as_view(), name='recurring'),
+    path('recurring/<int:id>/', views.RecurringIncomeDetail.as_view(), name='recurring-rud'),
     path('source-averages/', views.IncomeAverages.as_view(), name='source-averages'),
-    path('yearly-stats/', views.YearlyIncome.as_view(), name='yearly-stats')
+    path('yearly-stats/', views.YearlyIncome.as_view(), name='yearly-stats'),
+    path('timeseries/', views.IncomeTimeSeries.as_view(), name='timeseries')
 ]
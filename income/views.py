@@ -3,18 +3,25 @@ from django.shortcuts import render
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from drf_yasg.utils import swagger_auto_schema
 
-from .serializers import IncomeSerializer
-from .models import Income
+from .serializers import IncomeSerializer, RecurringIncomeSerializer
+from .models import Income, RecurringIncome
 
 from incomeexpensesapi.permissions import IsOwner
 from incomeexpensesapi.renderers import DefaultRenderer
+from incomeexpensesapi.caching import cache_per_user, conditional_get
+from incomeexpensesapi.exports import LedgerExportAPIView
+from incomeexpensesapi.mixins import LedgerWriteMixin
+from incomeexpensesapi.pagination import LedgerPagination
+from incomeexpensesapi.rollups import summarize_all, summarize_window
+from incomeexpensesapi.timeseries import TimeSeriesAPIView
 
 from datetime import date, timedelta
 
 # Create your views here.
 
-class IncomeList(generics.ListCreateAPIView):
+class IncomeList(LedgerWriteMixin, generics.ListCreateAPIView):
     """
     Basic List/Create enpoint for `GET`/`POST` requests.
     """
@@ -22,14 +29,35 @@ class IncomeList(generics.ListCreateAPIView):
     serializer_class = IncomeSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Income.objects.all()
+    pagination_class = LedgerPagination
 
     def get_queryset(self):
         return self.queryset.filter(owner=self.request.user)
 
-    def perform_create(self, serializer):
-        return serializer.save(owner=self.request.user)
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-class IncomeDetail(generics.RetrieveUpdateDestroyAPIView):
+class IncomeBatchCreate(LedgerWriteMixin, generics.GenericAPIView):
+    """
+    Batch create endpoint for `POST` requests with a list of up to `max_batch_size`
+    `Income` records. Either every record gets saved, or none is and the response
+    lists the errors of each record.
+    """
+
+    serializer_class = IncomeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 5000
+
+    @swagger_auto_schema(request_body=IncomeSerializer(many=True), responses={201: IncomeSerializer(many=True)})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False, max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class IncomeDetail(LedgerWriteMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Basic Retrieve/Update/Delete for `GET`/`PUT`/`PATCH`/`DELETE` requests.
     """
@@ -42,6 +70,49 @@ class IncomeDetail(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return self.queryset.filter(owner=self.request.user)
 
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+class RecurringIncomeList(generics.ListCreateAPIView):
+    """
+    List/Create endpoint for `RecurringIncome` templates, their occurrences are
+    created by `materialize_recurring`.
+    """
+
+    serializer_class = RecurringIncomeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = RecurringIncome.objects.all()
+
+    def get_queryset(self):
+        return self.queryset.filter(owner=self.request.user).order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+class RecurringIncomeDetail(generics.RetrieveUpdateDestroyAPIView):
+    """
+    Retrieve/Update/Delete endpoint for a single `RecurringIncome` template,
+    income already created from it is kept.
+    """
+
+    serializer_class = RecurringIncomeSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+    queryset = RecurringIncome.objects.all()
+    lookup_field = 'id'
+
+    def get_queryset(self):
+        return self.queryset.filter(owner=self.request.user)
+
+class IncomeExport(LedgerExportAPIView):
+    """
+    Streams all of the user's `Income` records as CSV or NDJSON.
+    """
+
+    model = Income
+    fields = ['id', 'date', 'source', 'description', 'amount']
+    filename = 'income'
+
 class IncomeAverages(APIView):
     """
     Collects all `Income` records related to current user, calculates average
@@ -53,22 +124,13 @@ class IncomeAverages(APIView):
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [DefaultRenderer]
 
-    def get_average_for_source(self, qs, source):
-        income = qs.filter(
-            source=source,
-        )
-        avg = round(float(sum([i.amount for i in income]) / len(income)), 2)
-        return avg
-
+    @conditional_get
+    @cache_per_user
     def get(self, request):
 
-        income_qs = Income.objects.filter(owner=request.user)
-
-        sources = list(set([i.source for i in income_qs]))
+        summary = summarize_all(Income, request.user)
 
-        final = {entry:{'amount':self.get_average_for_source(income_qs, entry), 'records': income_qs.filter(
-                    source=entry
-                ).count()} for entry in sources}
+        final = {entry:{'amount':totals.average, 'records': totals.count} for entry, totals in summary.items()}
 
         return Response(final, status=status.HTTP_200_OK)
 
@@ -82,23 +144,26 @@ class YearlyIncome(APIView):
     permission_classes = [permissions.IsAuthenticated]
     renderer_classes = [DefaultRenderer]
 
-    def get_total_for_source(self, queryset, source):
-        return sum([i.amount for i in queryset.filter(source=source)])
-
+    @conditional_get
+    @cache_per_user
     def get(self, request):
 
-        income_qs = Income.objects.filter(owner=request.user)
-
-        sources = list(set([i.source for i in income_qs]))
-
         today = date.today()
         year_ago = today - timedelta(days=365)
 
-        income_within_year = income_qs.filter(
-            date__lte=today,
-            date__gte=year_ago
-        )
+        # Every source the user has ever used is listed, with zero for the ones
+        # that have no records within the last year.
+        summary = summarize_window(Income, request.user, year_ago, today)
 
-        final = {entry:self.get_total_for_source(income_within_year, entry) for entry in sources}
+        final = {entry:totals.total for entry, totals in summary.items()}
 
         return Response(final, status=status.HTTP_200_OK)
+
+class IncomeTimeSeries(TimeSeriesAPIView):
+    """
+    Collects `Income` records within any date range, optionally of a single source,
+    and calculates total result per day, week, month or year.
+    """
+
+    model = Income
+    key_field = 'source'
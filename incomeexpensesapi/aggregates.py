@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+class Totals(namedtuple('Totals', ['total', 'count'])):
+    """
+    Sum of `amount` and number of records for a single category/source.
+    """
+
+    __slots__ = ()
+
+    @property
+    def average(self):
+        if not self.count:
+            return 0.0
+        return round(float(self.total / self.count), 2)
+
+    def __add__(self, other):
+        return Totals(self.total + other.total, self.count + other.count)
+
+
+def grouped(queryset, field, amount='amount', count=None, condition=None):
+    """
+    Builds the `GROUP BY field` query behind `summarize`, yielding
+    `(value, total, count)` rows.
+    """
+
+    records = Sum(count, filter=condition) if count else Count('pk', filter=condition)
+
+    return queryset.order_by().values(field).annotate(
+        _total=Coalesce(Sum(amount, filter=condition), 0),
+        _count=Coalesce(records, 0)
+    ).values_list(field, '_total', '_count')
+
+
+def summarize(queryset, field, amount='amount', count=None, condition=None):
+    """
+    Groups `queryset` by `field` with a single `GROUP BY` query and returns
+    a `{value: Totals}` mapping.
+
+    `amount` is the column being summed. `count` optionally names a column
+    holding pre-aggregated record counts, otherwise rows are counted.
+    `condition` (a `Q` object) restricts the aggregates without dropping groups,
+    so every value present in `queryset` is returned, possibly with zeros.
+    """
+
+    rows = grouped(queryset, field, amount=amount, count=count, condition=condition)
+    return {key: Totals(total, records) for key, total, records in rows}
+
+
+def merge(*summaries):
+    """
+    Adds several `summarize` results together key by key.
+    """
+
+    final = {}
+    for summary in summaries:
+        for key, totals in summary.items():
+            final[key] = final[key] + totals if key in final else totals
+    return final
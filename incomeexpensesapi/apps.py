@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class IncomeExpensesAPIConfig(AppConfig):
+    name = 'incomeexpensesapi'
+
+    def ready(self):
+        from . import checks  # noqa: F401
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from . import metrics
+
+
+# Bumped in the default cache whenever a process invalidates a user.
+SHARED_GENERATION_KEY = 'auth-user-cache-generation'
+
+
+class UserCache:
+    """
+    Thread safe LRU of at most `size` users, each expiring `ttl` seconds
+    after being loaded. The field values are stored rather than the instances,
+    so concurrent requests never share (and mutate) the same `User`.
+
+    Every process has its own: invalidations are published with `publish`,
+    and `sync` drops all the entries once another process published one,
+    checking at most every `sync_interval` seconds. So a user deactivated or
+    whose password changed elsewhere stays authenticated here for up to
+    `sync_interval` seconds (rather than `ttl`).
+
+    Counts `hits` and `misses`, see `stats`.
+    """
+
+    def __init__(self, size, ttl, sync_interval=1):
+        self.size = size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped by every invalidation, so a user loaded from the database
+        # before one is never cached after it.
+        self.generation = 0
+        # of the shared generation, as of the last `sync`
+        self.synced_at = float('-inf')
+        self.shared_generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def sync(self):
+        now = time.monotonic()
+        if now - self.synced_at < self.sync_interval:
+            return
+        self.synced_at = now
+
+        shared_generation = cache.get(SHARED_GENERATION_KEY)
+        if shared_generation != self.shared_generation:
+            self.shared_generation = shared_generation
+            self.clear()
+
+    def publish(self):
+        cache.add(SHARED_GENERATION_KEY, 0, None)
+        shared_generation = cache.incr(SHARED_GENERATION_KEY)
+        # Nothing to drop for this process's own invalidation.
+        if self.shared_generation is not None and shared_generation == self.shared_generation + 1:
+            self.shared_generation = shared_generation
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, values, generation):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, values)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'max_size': self.size,
+                'ttl': self.ttl,
+            }
+
+
+user_cache = UserCache(
+    settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL, settings.AUTH_USER_CACHE_SYNC_INTERVAL
+)
+
+
+def user_cache_metrics():
+    stats = user_cache.stats()
+    return [
+        ('cache_requests_total', (('cache', 'auth_user'), ('result', 'hit')), stats['hits']),
+        ('cache_requests_total', (('cache', 'auth_user'), ('result', 'miss')), stats['misses']),
+        ('cache_entries', (('cache', 'auth_user'),), stats['size']),
+    ]
+
+
+metrics.registry.collectors.append(user_cache_metrics)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def forget_user(sender, instance, **kwargs):
+    # Any change may be a deactivation or a password reset. Changes made with
+    # `QuerySet.update()` send no signal and only take effect once cached
+    # entries expire, so keep the TTL short. Other processes are told once
+    # the change is committed, so they can't load the previous row again.
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+    transaction.on_commit(user_cache.publish)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Drop-in replacement of `JWTAuthentication` resolving the token's user
+    through `user_cache` instead of querying it on every request. Entries are
+    dropped whenever the user is saved or deleted, by every process within
+    `AUTH_USER_CACHE_SYNC_INTERVAL` seconds.
+    """
+
+    user_cache = user_cache
+
+    def get_user(self, validated_token):
+        self.user_cache.sync()
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            generation = self.user_cache.generation
+            user = super().get_user(validated_token)
+            self.cache_user(validated_token, user, generation)
+        return user
+
+    def get_cached_user(self, validated_token):
+        values = self.user_cache.get(validated_token.get(api_settings.USER_ID_CLAIM))
+        if values is None:
+            return None
+
+        user = self.user_model.from_db(self.user_model.objects.db, self.field_names(), values)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def cache_user(self, validated_token, user, generation):
+        values = [getattr(user, name) for name in self.field_names()]
+        self.user_cache.set(validated_token[api_settings.USER_ID_CLAIM], values, generation)
+
+    def field_names(self):
+        return [field.attname for field in self.user_model._meta.concrete_fields]
@@ -0,0 +1,56 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's SQLite backend with two more `OPTIONS`:
+
+    - `pragmas`: a dict of `PRAGMA`s run on every new connection, e.g.
+      `{'journal_mode': 'WAL', 'busy_timeout': 5000}`.
+    - `transaction_mode`: how `atomic` blocks begin their transaction,
+      `DEFERRED` (SQLite's and Django's default), `IMMEDIATE` or `EXCLUSIVE`.
+
+    A deferred transaction only takes the write lock at its first write. If
+    another connection wrote in the meantime, the upgrade fails at once with
+    `database is locked`, whatever the busy timeout, since waiting can't help
+    a transaction that has already read stale data. `IMMEDIATE` takes the
+    lock at `BEGIN`, where waiting for it is safe, so concurrent writers
+    queue up on the busy timeout instead of failing. In WAL mode readers
+    don't need the lock and are never blocked by it.
+
+    Django 5.1 has the same `transaction_mode` option, and `init_command`
+    for the pragmas.
+    """
+
+    pragmas = {}
+    transaction_mode = 'DEFERRED'
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', 'DEFERRED').upper()
+
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES['{self.alias}']['OPTIONS']['transaction_mode'] must be one of "
+                f"{', '.join(TRANSACTION_MODES)}, not {self.transaction_mode!r}."
+            )
+        for name, value in self.pragmas.items():
+            # Pragmas take no parameters, so they are checked rather than quoted.
+            if not re.fullmatch(r'\w+', name) or not re.fullmatch(r'-?\w+', str(value)):
+                raise ImproperlyConfigured(f"Invalid SQLite pragma {name!r}: {value!r}.")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
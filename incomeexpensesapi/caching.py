@@ -0,0 +1,138 @@
+import hashlib
+import math
+import time
+from datetime import date, datetime, time as day_start, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+from . import metrics
+
+
+def get_cache():
+    return caches[settings.LEDGER_CACHE_ALIAS]
+
+
+def version_key(owner_id):
+    return f'ledger-version:{owner_id}'
+
+
+def new_version():
+    # A fresh, never reused value rather than a counter: should the version
+    # get evicted, entries cached under the old one can't become valid again.
+    return f'{time.time_ns():x}'
+
+
+def entry_key(owner_id, full_path):
+    return f'stats:{owner_id}:{date.today()}:{full_path}'
+
+
+def get_version(owner_id):
+    cache = get_cache()
+    version = cache.get(version_key(owner_id))
+    if version is None:
+        cache.add(version_key(owner_id), new_version(), None)
+        version = cache.get(version_key(owner_id))
+    return version
+
+
+def validators(owner_id, version, media_type, full_path):
+    """
+    The `ETag` and `Last-Modified` (as a timestamp) of a response, derived
+    from the user's ledger version plus the URL, the media type and the day.
+    """
+
+    today = date.today()
+
+    fingerprint = f'{owner_id}:{version}:{today}:{media_type}:{full_path}'
+    etag = '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    # HTTP dates have a one second resolution, `If-None-Match` takes
+    # precedence over `If-Modified-Since` when clients send both.
+    changed_at = math.ceil(int(version, 16) / 1e9)
+    # Results of the stats views depend on the day as well.
+    last_modified = max(changed_at, int(datetime.combine(today, day_start(), tzinfo=timezone.utc).timestamp()))
+
+    return etag, last_modified
+
+
+def bump_version(owner_id):
+    """
+    Invalidates everything cached for `owner_id` once the current transaction
+    commits. Doing it any earlier would let a concurrent read cache the
+    uncommitted (old) state under the new version.
+    """
+
+    transaction.on_commit(lambda: get_cache().set(version_key(owner_id), new_version(), None))
+
+
+def cache_per_user(view_method):
+    """
+    Caches the `Response.data` of a `GET` handler per user, URL and day,
+    until any of the user's records change.
+
+    The entry is stored along with the user's ledger version and both are
+    fetched with a single `get_many`, so a repeated read costs one cache
+    round trip and no queries.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        cache = get_cache()
+        owner_id = request.user.pk
+
+        key = entry_key(owner_id, request.get_full_path())
+        found = cache.get_many([version_key(owner_id), key])
+
+        version = found.get(version_key(owner_id))
+        entry = found.get(key)
+        if version is not None and entry is not None and entry[0] == version:
+            metrics.registry.inc('cache_requests_total', metrics.LEDGER_CACHE_HIT)
+            return Response(entry[1])
+        metrics.registry.inc('cache_requests_total', metrics.LEDGER_CACHE_MISS)
+
+        if version is None:
+            version = get_version(owner_id)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, (version, response.data), settings.LEDGER_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
+
+
+def conditional_get(view_method):
+    """
+    Adds a strong `ETag` and a `Last-Modified` header to the responses of
+    a `GET` handler, and answers `If-None-Match`/`If-Modified-Since` with
+    `304 Not Modified` before the handler runs.
+
+    Both are derived from the user's ledger version (plus the URL, the
+    negotiated media type and the day), so checking them costs a single
+    cache lookup and nothing gets queried, serialized or hashed.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version = get_version(request.user.pk)
+        etag, last_modified = validators(
+            request.user.pk, version, request.accepted_media_type, request.get_full_path()
+        )
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    return wrapper
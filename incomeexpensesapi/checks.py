@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+# Backends keeping their entries within each process, if at all.
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register()
+def check_ledger_cache(app_configs, **kwargs):
+    """
+    The ledger versions in `LEDGER_CACHE_ALIAS` are what invalidates the
+    cached stats and their `ETag`s, every process must see the bumps of the
+    others.
+    """
+
+    backend = settings.CACHES[settings.LEDGER_CACHE_ALIAS]['BACKEND']
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        f"The ledger cache ({backend}) isn't shared between processes.",
+        hint=(
+            "Stats cached by one process would outlive the writes handled by the others. Point CACHE_BACKEND at a "
+            "shared backend (file based, Redis, Memcached). Single process servers and test runs can ignore this."
+        ),
+        id='incomeexpensesapi.W001',
+    )]
+
+
+@register()
+def check_replica_pins(app_configs, **kwargs):
+    """
+    `ReplicaMiddleware` remembers who just wrote in the default cache, the
+    process serving their next request must see it.
+    """
+
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.DATABASE_REPLICAS or backend not in PER_PROCESS_CACHES:
+        return []
+    return [Error(
+        f"The default cache ({backend}) isn't shared between processes, but DATABASE_REPLICAS are configured.",
+        hint=(
+            "Users could read from a replica that hasn't caught up with the writes another process handled for "
+            "them. Point CACHE_BACKEND at a shared backend (file based, Redis, Memcached), or silence this check "
+            "if only a single process serves the API."
+        ),
+        id='incomeexpensesapi.E002',
+    )]
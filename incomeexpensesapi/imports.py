@@ -0,0 +1,166 @@
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import transaction
+
+from expenses.models import Expense
+from income.models import Income
+
+from . import ledger
+from .serializers import MAX_AMOUNT
+
+
+def choice_lookup(choices):
+    """
+    Maps both the keys and the labels of `choices` (case-insensitively) onto the keys.
+    """
+
+    lookup = {}
+    for key, label in choices:
+        lookup[key.lower()] = key
+        lookup[label.lower()] = key
+    return lookup
+
+
+class StatementImport:
+    """
+    Imports a bank statement (CSV with a header row, or NDJSON) into the
+    `Expense` and `Income` tables of `owner`.
+
+    Every row needs a `date` (ISO format) and an `amount`, and may have a
+    `description` and a `category`. With `kind='auto'` negative amounts become
+    expenses and positive ones income, otherwise every row goes to the given
+    kind. Categories are matched against the `Expense` categories/`Income`
+    sources by key or label, falling back to `OTHER`.
+
+    `lines` is any iterable of text lines and is consumed lazily, rows are
+    written in `chunk_size` batches, each in its own transaction, so memory
+    stays bounded regardless of the statement size. `run` yields a progress
+    report after every chunk.
+    """
+
+    FORMATS = ('csv', 'ndjson')
+    KINDS = ('auto', 'expenses', 'income')
+
+    max_errors = 100
+
+    def __init__(self, owner, lines, format='csv', kind='auto', chunk_size=1000):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown statement format: {format}")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown kind of records: {kind}")
+
+        self.owner = owner
+        self.lines = lines
+        self.format = format
+        self.kind = kind
+        self.chunk_size = chunk_size
+
+        self.categories = choice_lookup(Expense.CATEGORY_CHOICES)
+        self.sources = choice_lookup(Income.SOURCE_CHOICES)
+
+        self.rows = 0
+        self.created = {'expenses': 0, 'income': 0}
+        self.errors = []
+        self.skipped = 0
+
+    def read(self):
+        if self.format == 'csv':
+            reader = csv.DictReader(self.lines)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(self.lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield number, row
+
+    def parse(self, row):
+        if not isinstance(row, dict):
+            raise ValueError("Not a record.")
+
+        try:
+            day = date.fromisoformat(str(row.get('date') or '').strip())
+        except ValueError:
+            raise ValueError("Invalid or missing date.")
+
+        try:
+            amount = Decimal(str(row.get('amount') or '').strip().replace(',', ''))
+            amount = int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+        except InvalidOperation:
+            raise ValueError("Invalid or missing amount.")
+        if abs(amount) > MAX_AMOUNT:
+            raise ValueError(f"Amount must not exceed {MAX_AMOUNT} either way.")
+
+        if self.kind == 'auto':
+            if not amount:
+                raise ValueError("Zero amount is neither an expense nor an income.")
+            kind = 'expenses' if amount < 0 else 'income'
+        else:
+            kind = self.kind
+
+        description = str(row.get('description') or '')
+        category = str(row.get('category') or '').strip().lower()
+
+        if kind == 'expenses':
+            return Expense(
+                owner=self.owner,
+                date=day,
+                amount=abs(amount),
+                description=description,
+                category=self.categories.get(category, 'OTHER')
+            )
+        return Income(
+            owner=self.owner,
+            date=day,
+            amount=abs(amount),
+            description=description,
+            source=self.sources.get(category, 'OTHER')
+        )
+
+    def write(self, records):
+        expenses = [record for record in records if isinstance(record, Expense)]
+        income = [record for record in records if isinstance(record, Income)]
+
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses)
+            Income.objects.bulk_create(income)
+            ledger.record_changes(added=records)
+
+        self.created['expenses'] += len(expenses)
+        self.created['income'] += len(income)
+
+    def progress(self):
+        return {
+            'rows': self.rows,
+            'expenses': self.created['expenses'],
+            'income': self.created['income'],
+            'skipped': self.skipped,
+        }
+
+    def run(self):
+        chunk = []
+
+        for number, row in self.read():
+            self.rows += 1
+            try:
+                chunk.append(self.parse(row))
+            except ValueError as e:
+                self.skipped += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({'row': number, 'error': str(e)})
+
+            if len(chunk) >= self.chunk_size:
+                self.write(chunk)
+                chunk = []
+                yield self.progress()
+
+        if chunk:
+            self.write(chunk)
+        yield self.progress()
@@ -0,0 +1,17 @@
+from itertools import chain
+
+from . import caching, rollups
+
+
+def record_changes(added=(), removed=()):
+    """
+    Single entry point for keeping everything derived from `Expense`/`Income`
+    records in step with them. Takes newly written (`added`) and deleted or
+    overwritten (`removed`) records and must be called inside the writing
+    transaction.
+    """
+
+    rollups.track(added=added, removed=removed)
+
+    for owner_id in {instance.owner_id for instance in chain(added, removed)}:
+        caching.bump_version(owner_id)
@@ -0,0 +1,126 @@
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.analytics import ROLLING_WINDOW, load_columns, spending_statistics
+from expenses.models import Expense
+
+
+def percentile(ordered, q):
+    # Linear interpolation between the closest ranks, like `np.percentile`.
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def python_statistics(rows, start, end, z_threshold=3.0):
+    """
+    Pure Python baseline computing the same as `spending_statistics`.
+    """
+
+    periods = (end - start).days + 1
+    by_category = defaultdict(list)
+    daily = defaultdict(lambda: defaultdict(int))
+
+    for pk, day, amount, category in rows:
+        offset = (day - start).days
+        daily[category][offset] += amount
+        if offset >= 0:
+            by_category[category].append((pk, day, amount))
+
+    result = {}
+    for category, records in sorted(by_category.items()):
+        records.sort(key=lambda record: (record[1], record[0]))
+        values = [amount for _, _, amount in records]
+        mean = sum(values) / len(values)
+        std = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+        ordered = sorted(values)
+
+        outliers = []
+        if std:
+            for pk, day, amount in records:
+                z = (amount - mean) / std
+                if abs(z) > z_threshold:
+                    outliers.append({'id': pk, 'date': str(day), 'amount': amount, 'z_score': round(z, 2)})
+
+        spent = daily[category]
+        window = sum(spent.get(offset, 0) for offset in range(-ROLLING_WINDOW + 1, 1))
+        rolling = [round(window / ROLLING_WINDOW, 2)]
+        for offset in range(1, periods):
+            window += spent.get(offset, 0) - spent.get(offset - ROLLING_WINDOW, 0)
+            rolling.append(round(window / ROLLING_WINDOW, 2))
+
+        result[category] = {
+            'records': len(values),
+            'total': sum(values),
+            'mean': round(mean, 2),
+            'median': round(percentile(ordered, 50), 2),
+            'p90': round(percentile(ordered, 90), 2),
+            'p99': round(percentile(ordered, 99), 2),
+            'std': round(std, 2),
+            'outliers': outliers,
+            'rolling_30d': rolling,
+        }
+
+    return result
+
+
+class Command(BaseCommand):
+    help = "Times `expenses.analytics` against a pure Python implementation of the same statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--days', type=int, default=365 * 3)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(0)
+        end = date.today()
+        start = end - timedelta(days=options['days'] - 1)
+        categories = [choice for choice, _ in Expense.CATEGORY_CHOICES]
+
+        # Shaped like the `values_list` rows both implementations start from.
+        rows = [
+            (
+                pk,
+                start + timedelta(days=rnd.randint(-ROLLING_WINDOW + 1, options['days'] - 1)),
+                int(rnd.lognormvariate(3, 1)),
+                rnd.choice(categories)
+            )
+            for pk in range(1, options['rows'] + 1)
+        ]
+
+        def vectorized():
+            return spending_statistics(*load_columns(rows), start, end)
+
+        def python():
+            return python_statistics(rows, start, end)
+
+        columns = load_columns(rows)
+
+        def statistics_only():
+            return spending_statistics(*columns, start, end)
+
+        if vectorized() != python():
+            raise CommandError("The two implementations disagree.")
+
+        timings = {}
+        # The last one leaves out turning the rows into arrays, the part
+        # still done row by row in Python.
+        for name, compute in (('pure Python', python), ('NumPy', vectorized), ('NumPy stats', statistics_only)):
+            elapsed = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                compute()
+                elapsed.append(time.perf_counter() - started)
+            timings[name] = min(elapsed)
+
+        for name, elapsed in timings.items():
+            self.stdout.write(
+                f"{name:<12} {elapsed * 1000:9.2f} ms  {timings['pure Python'] / elapsed:5.1f}x  ({options['rows']} rows)"
+            )
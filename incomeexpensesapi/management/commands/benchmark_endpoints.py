@@ -0,0 +1,462 @@
+import json
+import logging
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment
+)
+from django.urls import URLResolver, get_resolver, resolve
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from expenses.models import Budget, Expense, RecurringExpense
+from income.models import Income, RecurringIncome
+from incomeexpensesapi import metrics, recurring, rollups
+
+PASSWORD = 'benchmark-password'
+
+sql_logger = logging.getLogger('incomeexpensesapi.sql')
+
+# category: (share of the records, mu, sigma) of the log-normal amounts,
+# rent is paid monthly on top of these
+EXPENSE_CATEGORIES = {
+    'FOOD': (50, 3.0, 0.6),
+    'ONLINE_SERVICES': (15, 2.5, 0.5),
+    'TRAVEL': (10, 5.0, 0.8),
+    'OTHER': (25, 3.5, 1.0),
+}
+# same for the income sources, the salary is paid monthly on top of these
+INCOME_SOURCES = {
+    'HUSTLE': (50, 4.5, 0.7),
+    'BUSINESS': (20, 6.0, 0.9),
+    'OTHER': (30, 3.5, 1.0),
+}
+
+# Routes that can't be requested meaningfully on their own.
+UNCOVERED_PREFIXES = ('admin/',)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def log_normal(rnd, mu, sigma):
+    return max(1, round(rnd.lognormvariate(mu, sigma)))
+
+
+def weighted(rnd, distribution):
+    return rnd.choices(list(distribution), weights=[weight for weight, _, _ in distribution.values()])[0]
+
+
+def monthly(start, end, day):
+    month = start.replace(day=day)
+    while month <= end:
+        if month >= start:
+            yield month
+        month = (month.replace(day=1) + timedelta(days=32)).replace(day=day)
+
+
+def all_routes(resolver=None, prefix=''):
+    """
+    Every route of the URLconf as written in it, e.g. `expenses/<int:id>/`.
+    """
+
+    for pattern in (resolver or get_resolver()).url_patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from all_routes(pattern, route)
+        else:
+            yield route
+
+
+class Seed:
+    """
+    The seeded users and the objects the benchmarked requests refer to.
+    """
+
+    def __init__(self, rnd, users, expenses, income, days, pool_size):
+        today = date.today()
+        start = today - timedelta(days=days)
+        hashed = make_password(PASSWORD)
+
+        User.objects.bulk_create(
+            [User(email=f'user{n}@benchmark.local', password=hashed, is_verified=True) for n in range(users)]
+            + [User(email='admin@benchmark.local', password=hashed, is_verified=True, is_staff=True, is_admin=True)]
+            + [User(email='reset@benchmark.local', password=hashed, is_verified=True)]
+            + [User(email=f'unverified{n}@benchmark.local', password=hashed) for n in range(pool_size)]
+        )
+        self.users = list(User.objects.filter(email__startswith='user', email__endswith='@benchmark.local').order_by('id'))
+        self.admin = User.objects.get(email='admin@benchmark.local')
+        self.reset_user = User.objects.get(email='reset@benchmark.local')
+        self.unverified = list(User.objects.filter(email__startswith='unverified').order_by('id'))
+
+        records = {Expense: [], Income: []}
+        for user in self.users:
+            for day in monthly(start, today, 1):
+                records[Expense].append(Expense(
+                    owner=user, date=day, amount=round(rnd.gauss(900, 150)), description='Rent', category='RENT'
+                ))
+            for day in monthly(start, today, 25):
+                records[Income].append(Income(
+                    owner=user, date=day, amount=round(rnd.gauss(3000, 500)), description='Salary', source='SALARY'
+                ))
+
+            for model, count, distribution, field in [
+                (Expense, expenses, EXPENSE_CATEGORIES, 'category'),
+                (Income, income, INCOME_SOURCES, 'source'),
+            ]:
+                for _ in range(count):
+                    key = weighted(rnd, distribution)
+                    records[model].append(model(
+                        owner=user,
+                        date=start + timedelta(days=rnd.randint(0, days)),
+                        amount=log_normal(rnd, *distribution[key][1:]),
+                        description=f'{key.title()} purchase' if model is Expense else f'{key.title()} payment',
+                        **{field: key}
+                    ))
+
+                # targets of the DELETE requests
+                records[model].extend(
+                    model(owner=user, date=today, amount=1, description='To be deleted', **{field: 'OTHER'})
+                    for _ in range(pool_size)
+                )
+
+        for model, objects in records.items():
+            model.objects.bulk_create(objects, batch_size=1000)
+        for model in rollups.ROLLUPS:
+            rollups.rebuild(model)
+
+        Budget.objects.bulk_create(
+            Budget(owner=user, category=category, amount=log_normal(rnd, 6, 0.5))
+            for user in self.users for category in EXPENSE_CATEGORIES
+        )
+        for template_model, field, key in [(RecurringExpense, 'category', 'ONLINE_SERVICES'), (RecurringIncome, 'source', 'HUSTLE')]:
+            for user in self.users:
+                template = template_model(
+                    owner=user, description='Subscription', amount=15, frequency='MONTHLY',
+                    start_date=start, **{field: key}
+                )
+                template.next_date = recurring.first_occurrence(template, today)
+                template.save()
+
+        self.records = sum(len(objects) for objects in records.values())
+
+    def ids(self, queryset, user):
+        return list(queryset.filter(owner=user).order_by('id').values_list('id', flat=True))
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway test database with users, each with expenses and income drawn from realistic "
+        "distributions, then requests every route of the URLconf through the test client and reports the "
+        "latency percentiles, queries per request and throughput of each. Results are written as JSON, pass "
+        "a previous run's file with --compare to see the changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--expenses', type=int, default=1000, help="Expenses per user, besides the monthly rent.")
+        parser.add_argument('--income', type=int, default=200, help="Income records per user, besides the monthly salary.")
+        parser.add_argument('--days', type=int, default=730, help="How many days back the records go.")
+        parser.add_argument('--requests', type=int, default=30, help="Requests per route.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', action='append', help="Only benchmark the routes containing this, repeatable.")
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the results.")
+        parser.add_argument('--label', default='', help="Free text stored with the results, e.g. what changed.")
+        parser.add_argument('--compare', help="Results of a previous run to compare with.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['requests'] < 1:
+            raise CommandError("--users and --requests must be positive.")
+
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = {(route['method'], route['path']): route for route in json.load(f)['routes']}
+
+        metrics_dir = tempfile.mkdtemp()
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'}, serialized_aliases=set())
+        try:
+            with override_settings(
+                # Nothing of the run may leak into the configured cache, and
+                # logging in thousands of times mustn't be throttled.
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+                THROTTLE_STORE='incomeexpensesapi.throttling.LocMemBucketStore',
+                REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+                METRICS_DIR=metrics_dir,
+                METRICS_TOKEN='benchmark',
+            ):
+                # The middleware still measures every request, its log lines
+                # would only drown the report.
+                sql_logger.disabled = True
+                results = self.run(options)
+        finally:
+            sql_logger.disabled = False
+            metrics.registry.reset()
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+        self.report(results, previous)
+
+    def run(self, options):
+        rnd = random.Random(options['seed'])
+        started = time.perf_counter()
+        seed = Seed(rnd, options['users'], options['expenses'], options['income'], options['days'], options['requests'])
+        seeding = time.perf_counter() - started
+        self.stdout.write(f"Seeded {len(seed.users)} users and {seed.records} records in {seeding:.1f}s.")
+
+        requests = self.requests(seed, rnd, options['requests'])
+        if options['only']:
+            requests = [request for request in requests if any(part in request[1] for part in options['only'])]
+
+        routes = []
+        covered = set()
+        for method, path, make, client in requests:
+            routes.append(self.measure(client, method, path, make, options['requests']))
+            covered.add(resolve(make(0)[0].split('?')[0]).route)
+
+        return {
+            'label': options['label'],
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': self.commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'password_hash_iterations': settings.PASSWORD_HASH_ITERATIONS,
+            },
+            'options': {name: options[name] for name in ['users', 'expenses', 'income', 'days', 'requests', 'seed']},
+            'seeding_seconds': round(seeding, 2),
+            'routes': routes,
+            'uncovered_routes': [
+                route for route in all_routes() if route not in covered and not route.startswith(UNCOVERED_PREFIXES)
+            ] if not options['only'] else [],
+        }
+
+    def requests(self, seed, rnd, count):
+        """
+        `(method, path, make, client)` of every benchmarked request, `make(i)`
+        returning the path and the keyword arguments of the i-th one. Requests
+        cycle through the seeded users, authenticated by their JWT.
+        """
+
+        client = Client()
+        admin_client = Client()
+        admin_client.force_login(seed.admin)
+        today = date.today().isoformat()
+
+        headers = [{'HTTP_AUTHORIZATION': f'Bearer {user.tokens()["access"]}'} for user in seed.users]
+        refresh_tokens = [str(RefreshToken.for_user(user)) for user in seed.users]
+        verify_tokens = [str(RefreshToken.for_user(user).access_token) for user in seed.unverified]
+        admin = {'HTTP_AUTHORIZATION': f'Bearer {seed.admin.tokens()["access"]}'}
+        uidb64 = urlsafe_base64_encode(force_bytes(seed.reset_user.id))
+        reset_token = PasswordResetTokenGenerator().make_token(seed.reset_user)
+
+        ids = {
+            (model, n): seed.ids(model.objects.all(), user)
+            for n, user in enumerate(seed.users)
+            for model in [Expense, Income, Budget, RecurringExpense, RecurringIncome]
+        }
+        deletable = {
+            (model, n): seed.ids(model.objects.filter(description='To be deleted'), user)
+            for n, user in enumerate(seed.users)
+            for model in [Expense, Income]
+        }
+
+        def user_of(i):
+            return i % len(seed.users)
+
+        def get(path):
+            return lambda i: (path, headers[user_of(i)])
+
+        def json_body(path, body):
+            return lambda i: (path, {'data': body(i), 'content_type': 'application/json', **headers[user_of(i)]})
+
+        def detail(path, model, body=None):
+            def make(i):
+                pk = ids[(model, user_of(i))][0]
+                kwargs = {'data': body(i), 'content_type': 'application/json'} if body else {}
+                return path.format(pk), {**kwargs, **headers[user_of(i)]}
+            return make
+
+        def delete(path, model):
+            return lambda i: (path.format(deletable[(model, user_of(i))][i // len(seed.users)]), headers[user_of(i)])
+
+        def expense(i):
+            category = weighted(rnd, EXPENSE_CATEGORIES)
+            return {'date': today, 'amount': log_normal(rnd, *EXPENSE_CATEGORIES[category][1:]), 'description': 'Benchmark', 'category': category}
+
+        def income(i):
+            source = weighted(rnd, INCOME_SOURCES)
+            return {'date': today, 'amount': log_normal(rnd, *INCOME_SOURCES[source][1:]), 'description': 'Benchmark', 'source': source}
+
+        def statement(i):
+            lines = ['date,amount,description,category'] + [
+                f"{today},{rnd.choice([-1, 1]) * log_normal(rnd, 3.5, 1.0)},Statement line,OTHER" for _ in range(100)
+            ]
+            upload = SimpleUploadedFile('statement.csv', '\n'.join(lines).encode(), content_type='text/csv')
+            return '/import/', {'data': {'file': upload}, **headers[user_of(i)]}
+
+        def template(field, key):
+            return lambda i: {
+                'description': 'Benchmark', 'amount': 10, field: key, 'frequency': 'WEEKLY', 'start_date': today
+            }
+
+        return [
+            ('GET', '/', lambda i: ('/', {}), client),
+            ('GET', '/?format=openapi', lambda i: ('/?format=openapi', {}), client),
+            ('GET', '/redoc/', lambda i: ('/redoc/', {}), client),
+            ('GET', '/admin/', lambda i: ('/admin/', {}), admin_client),
+
+            ('POST', '/auth/signup/', lambda i: ('/auth/signup/', {
+                'data': {'email': f'signup{i}@benchmark.local', 'full_name': 'Benchmark', 'password': PASSWORD}
+            }), client),
+            ('GET', '/auth/verify-email/', lambda i: (f'/auth/verify-email/?token={verify_tokens[i]}', {}), client),
+            ('POST', '/auth/login/', lambda i: ('/auth/login/', {
+                'data': {'email': seed.users[user_of(i)].email, 'password': PASSWORD}
+            }), client),
+            ('POST', '/auth/token/refresh/', lambda i: ('/auth/token/refresh/', {
+                'data': {'refresh': refresh_tokens[user_of(i)]}
+            }), client),
+            ('POST', '/auth/request-password-reset-email/', lambda i: ('/auth/request-password-reset-email/', {
+                'data': {'email': seed.users[user_of(i)].email}
+            }), client),
+            ('GET', '/auth/password-reset/<uidb64>/<token>/', lambda i: (f'/auth/password-reset/{uidb64}/{reset_token}/', {}), client),
+            ('PATCH', '/auth/password-reset/', lambda i: ('/auth/password-reset/', {
+                'data': {'password': PASSWORD, 'token': reset_token, 'uidb64': uidb64}, 'content_type': 'application/json'
+            }), client),
+
+            ('GET', '/expenses/', get('/expenses/'), client),
+            ('GET', '/expenses/?pagination=cursor', get('/expenses/?pagination=cursor'), client),
+            ('POST', '/expenses/', json_body('/expenses/', expense), client),
+            ('POST', '/expenses/batch/', json_body('/expenses/batch/', lambda i: [expense(i) for _ in range(20)]), client),
+            ('GET', '/expenses/export/', get('/expenses/export/'), client),
+            ('GET', '/expenses/<int:id>/', detail('/expenses/{}/', Expense), client),
+            ('PATCH', '/expenses/<int:id>/', detail('/expenses/{}/', Expense, lambda i: {'amount': i + 1}), client),
+            ('DELETE', '/expenses/<int:id>/', delete('/expenses/{}/', Expense), client),
+            ('GET', '/expenses/budgets/', get('/expenses/budgets/'), client),
+            ('GET', '/expenses/budgets/<int:id>/', detail('/expenses/budgets/{}/', Budget), client),
+            ('PATCH', '/expenses/budgets/<int:id>/', detail('/expenses/budgets/{}/', Budget, lambda i: {'amount': 500 + i}), client),
+            ('GET', '/expenses/recurring/', get('/expenses/recurring/'), client),
+            ('POST', '/expenses/recurring/', json_body('/expenses/recurring/', template('category', 'ONLINE_SERVICES')), client),
+            ('GET', '/expenses/recurring/<int:id>/', detail('/expenses/recurring/{}/', RecurringExpense), client),
+            ('PATCH', '/expenses/recurring/<int:id>/', detail('/expenses/recurring/{}/', RecurringExpense, lambda i: {'amount': 10 + i}), client),
+            ('GET', '/expenses/yearly-stats/', get('/expenses/yearly-stats/'), client),
+            ('GET', '/expenses/category-averages/', get('/expenses/category-averages/'), client),
+            ('GET', '/expenses/timeseries/?granularity=week', get('/expenses/timeseries/?granularity=week'), client),
+            ('GET', '/expenses/analytics/', get('/expenses/analytics/'), client),
+
+            ('GET', '/income/', get('/income/'), client),
+            ('GET', '/income/?pagination=cursor', get('/income/?pagination=cursor'), client),
+            ('POST', '/income/', json_body('/income/', income), client),
+            ('POST', '/income/batch/', json_body('/income/batch/', lambda i: [income(i) for _ in range(20)]), client),
+            ('GET', '/income/export/', get('/income/export/'), client),
+            ('GET', '/income/<int:id>/', detail('/income/{}/', Income), client),
+            ('PATCH', '/income/<int:id>/', detail('/income/{}/', Income, lambda i: {'amount': i + 1}), client),
+            ('DELETE', '/income/<int:id>/', delete('/income/{}/', Income), client),
+            ('GET', '/income/recurring/', get('/income/recurring/'), client),
+            ('POST', '/income/recurring/', json_body('/income/recurring/', template('source', 'HUSTLE')), client),
+            ('GET', '/income/recurring/<int:id>/', detail('/income/recurring/{}/', RecurringIncome), client),
+            ('PATCH', '/income/recurring/<int:id>/', detail('/income/recurring/{}/', RecurringIncome, lambda i: {'amount': 10 + i}), client),
+            ('GET', '/income/source-averages/', get('/income/source-averages/'), client),
+            ('GET', '/income/yearly-stats/', get('/income/yearly-stats/'), client),
+            ('GET', '/income/timeseries/?granularity=week', get('/income/timeseries/?granularity=week'), client),
+
+            ('POST', '/import/', statement, client),
+            ('GET', '/cashflow/', get('/cashflow/'), client),
+            ('GET', '/auth-cache/', lambda i: ('/auth-cache/', admin), client),
+            ('GET', '/metrics/', lambda i: ('/metrics/', {'HTTP_AUTHORIZATION': f'Bearer {settings.METRICS_TOKEN}'}), client),
+        ]
+
+    def measure(self, client, method, path, make, count):
+        latencies = []
+        queries = []
+        errors = 0
+        first_error = None
+
+        for i in range(count):
+            url, kwargs = make(i)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method.lower())(url, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+
+            if response.status_code >= 400:
+                errors += 1
+                if first_error is None:
+                    first_error = f'{response.status_code} {response.content[:200].decode(errors="replace")}'
+
+        ordered = sorted(latencies)
+        return {
+            'method': method,
+            'path': path,
+            'requests': count,
+            'errors': errors,
+            'first_error': first_error,
+            'first_ms': round(latencies[0] * 1000, 2),
+            'p50_ms': round(statistics.median(ordered) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 2),
+            'requests_per_second': round(count / sum(latencies), 1),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, results, previous):
+        self.stdout.write(
+            f"{'route':<52} {'errors':>6} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'req/s':>8} {'queries':>8}" + (f" {'p50 vs prev':>12}" if previous else '')
+        )
+
+        for route in results['routes']:
+            line = (
+                f"{route['method'] + ' ' + route['path']:<52} {route['errors']:>6} {route['first_ms']:>9.1f} "
+                f"{route['p50_ms']:>8.1f} {route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f} "
+                f"{route['requests_per_second']:>8.1f} {route['queries_mean']:>8.1f}"
+            )
+            if previous:
+                before = previous.get((route['method'], route['path']))
+                line += f" {route['p50_ms'] / before['p50_ms']:>11.2f}x" if before and before['p50_ms'] else f" {'-':>12}"
+            self.stdout.write(self.style.ERROR(line) if route['errors'] else line)
+
+            if route['first_error']:
+                self.stdout.write(f"    {route['first_error']}")
+
+        if results['uncovered_routes']:
+            self.stdout.write(self.style.WARNING(f"Not benchmarked: {', '.join(results['uncovered_routes'])}"))
@@ -0,0 +1,107 @@
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from rest_framework import serializers
+
+from authentication.models import User
+from authentication.serializers import LoginSerializer
+
+EMAIL = 'benchmark-login@example.com'
+PASSWORD = 'benchmark-login-password'
+
+
+class LegacyLoginSerializer(LoginSerializer):
+    """
+    `LoginSerializer` as it used to be: looks the user up again after
+    `authenticate`, then twice more in `get_tokens`, minting three refresh
+    tokens per login.
+    """
+
+    tokens = serializers.SerializerMethodField()
+
+    def get_tokens(self, obj):
+        user = User.objects.get(email=obj.get('email'))
+
+        return {
+            'access': user.tokens().get('access'),
+            'refresh': user.tokens().get('refresh')
+        }
+
+    def validate(self, attrs):
+        user = authenticate(email=attrs.get('email'), password=attrs.get('password'))
+        if not user:
+            raise serializers.ValidationError("This user doesn't exist.")
+
+        user_obj = User.objects.get(email=attrs.get('email'))
+
+        return {
+            'email': attrs.get('email'),
+            'tokens': user_obj.tokens()
+        }
+
+
+def login(serializer_class):
+    serializer = serializer_class(data={'email': EMAIL, 'password': PASSWORD})
+    serializer.is_valid(raise_exception=True)
+    return serializer.data
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures logins/sec of a single core for the old and the new login serializer at one or more "
+        "PBKDF2 iteration counts, along with the queries per login and the share of the time spent hashing. "
+        "Works on a throwaway user inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help="Timed logins per serializer and iteration count.")
+        parser.add_argument(
+            '--iterations',
+            help="Comma separated PBKDF2 iteration counts, defaults to PASSWORD_HASH_ITERATIONS."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = [int(count) for count in (options['iterations'] or str(settings.PASSWORD_HASH_ITERATIONS)).split(',')]
+        except ValueError:
+            raise CommandError("--iterations takes comma separated numbers.")
+
+        self.stdout.write(f"{os.cpu_count()} cores, the process uses one.")
+        self.stdout.write(
+            f"{'iterations':>10} {'serializer':<8} {'logins/s':>9} {'ms/login':>9} {'hash ms':>8} {'queries':>8}"
+        )
+
+        with transaction.atomic():
+            User.objects.create_user(email=EMAIL, password=PASSWORD, is_verified=True)
+
+            for count in counts:
+                with override_settings(PASSWORD_HASH_ITERATIONS=count):
+                    hashed = make_password(PASSWORD)
+                    started = time.perf_counter()
+                    check_password(PASSWORD, hashed)
+                    hashing = time.perf_counter() - started
+
+                    for name, serializer_class in [('legacy', LegacyLoginSerializer), ('current', LoginSerializer)]:
+                        # The first login rehashes the password at `count` iterations.
+                        login(serializer_class)
+
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            for _ in range(options['logins']):
+                                login(serializer_class)
+                            elapsed = time.perf_counter() - started
+
+                        self.stdout.write(
+                            f"{count:>10} {name:<8} {options['logins'] / elapsed:>9.1f} "
+                            f"{elapsed / options['logins'] * 1000:>9.1f} {hashing * 1000:>8.1f} "
+                            f"{len(queries) / options['logins']:>8.1f}"
+                        )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,164 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from expenses.models import Expense
+from income.models import Income
+from incomeexpensesapi.aggregates import grouped
+from incomeexpensesapi.rollups import split_window
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a standalone SQLite database with millions of `Expense`/`Income` rows "
+        "and prints `EXPLAIN QUERY PLAN` and timings of every endpoint's query, "
+        "with only the plain `owner` index (before) and with the composite indexes (after)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=os.path.join(tempfile.gettempdir(), 'moneytracker-bench.sqlite3'))
+        parser.add_argument('--rows', type=int, default=2_000_000, help="Rows seeded into each table.")
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--reuse', action='store_true', help="Reuse a database seeded by a previous run.")
+
+    def handle(self, *args, **options):
+        if not options['reuse'] and os.path.exists(options['path']):
+            os.remove(options['path'])
+
+        db = sqlite3.connect(options['path'])
+
+        if not options['reuse']:
+            self.seed(db, options['rows'], options['users'])
+
+        queries = self.get_queries(owner_id=1, rows_per_user=options['rows'] // options['users'])
+
+        self.set_indexes(db, composite=False)
+        before = {name: self.measure(db, sql, params, options['repeat']) for name, (sql, params) in queries.items()}
+
+        self.set_indexes(db, composite=True)
+        after = {name: self.measure(db, sql, params, options['repeat']) for name, (sql, params) in queries.items()}
+
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, (elapsed, plan) in (('before', before[name]), ('after', after[name])):
+                self.stdout.write(f"  {label:<6} {elapsed * 1000:10.3f} ms")
+                for line in plan:
+                    self.stdout.write(f"           {line}")
+
+        db.close()
+
+    def seed(self, db, rows, users):
+        self.stdout.write(f"Seeding {rows} rows into each table of {users} users...")
+
+        with connection.schema_editor(collect_sql=True) as editor:
+            editor.create_model(Expense)
+            editor.create_model(Income)
+        db.executescript(';\n'.join(editor.collected_sql))
+
+        rnd = random.Random(0)
+        today = date.today()
+        expense_categories = [choice for choice, _ in Expense.CATEGORY_CHOICES]
+        income_sources = [choice for choice, _ in Income.SOURCE_CHOICES]
+
+        def generate(choices):
+            for _ in range(rows):
+                yield (
+                    rnd.randint(1, users),
+                    (today - timedelta(days=rnd.randint(0, 365 * 5))).isoformat(),
+                    '',
+                    rnd.randint(1, 500),
+                    rnd.choice(choices)
+                )
+
+        with db:
+            db.executemany(
+                f"INSERT INTO {Expense._meta.db_table} (owner_id, date, description, amount, category) VALUES (?, ?, ?, ?, ?)",
+                generate(expense_categories)
+            )
+            db.executemany(
+                f"INSERT INTO {Income._meta.db_table} (owner_id, date, description, amount, source) VALUES (?, ?, ?, ?, ?)",
+                generate(income_sources)
+            )
+        db.execute('ANALYZE')
+
+    def set_indexes(self, db, composite):
+        """
+        Switches between the pre-migration indexes (a single one on `owner`)
+        and the composite ones declared in the models' `Meta.indexes`.
+        """
+
+        for model in (Expense, Income):
+            table = model._meta.db_table
+            db.execute(f"DROP INDEX IF EXISTS bench_{table}_owner")
+            for index in model._meta.indexes:
+                db.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+            if composite:
+                with connection.schema_editor(collect_sql=True) as editor:
+                    for index in model._meta.indexes:
+                        editor.add_index(model, index)
+                for sql in editor.collected_sql:
+                    db.execute(sql.rstrip(';'))
+            else:
+                db.execute(f"CREATE INDEX bench_{table}_owner ON {table} (owner_id)")
+
+        db.execute('ANALYZE')
+
+    def get_queries(self, owner_id, rows_per_user):
+        """
+        The querysets the endpoints run, compiled to SQL for the raw connection.
+        """
+
+        today = date.today()
+        year_ago = today - timedelta(days=365)
+        _, edges = split_window(year_ago, today)
+
+        expenses = Expense.objects.filter(owner_id=owner_id)
+        income = Income.objects.filter(owner_id=owner_id)
+
+        querysets = {
+            'expenses: list, first page': expenses[:10],
+            'expenses: list, deep page': expenses[rows_per_user // 2:rows_per_user // 2 + 10],
+            'expenses: yearly-stats edges': grouped(expenses.filter(edges), 'category'),
+            'expenses: category within a year': expenses.filter(
+                category='FOOD', date__gte=year_ago, date__lte=today
+            ).order_by().values('category').annotate(total=Sum('amount')),
+            'income: list, first page': income[:10],
+            'income: list, deep page': income[rows_per_user // 2:rows_per_user // 2 + 10],
+            'income: yearly-stats edges': grouped(income.filter(edges), 'source'),
+            'income: source within a year': income.filter(
+                source='SALARY', date__gte=year_ago, date__lte=today
+            ).order_by().values('source').annotate(total=Sum('amount')),
+        }
+
+        queries = {}
+        for name, queryset in querysets.items():
+            sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+            params = tuple(param.isoformat() if isinstance(param, date) else param for param in params)
+            queries[name] = (sql.replace('%s', '?'), params)
+
+        # `PageNumberPagination` counts the owner's records on every page.
+        for name, model in (('expenses: list, count', Expense), ('income: list, count', Income)):
+            queries[name] = (f"SELECT COUNT(*) FROM {model._meta.db_table} WHERE owner_id = ?", (owner_id,))
+
+        return queries
+
+    def measure(self, db, sql, params, repeat):
+        plan = [row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - started)
+
+        return statistics.median(timings), plan
@@ -0,0 +1,69 @@
+import json
+import random
+import timeit
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from expenses.models import Expense
+from incomeexpensesapi.renderers import DefaultRenderer, orjson
+
+
+def legacy_render(data):
+    """
+    `DefaultRenderer.render` as it used to be: stringifies the whole payload
+    to look for errors, then encodes it to a `str`.
+    """
+
+    response = ''
+
+    if 'ErrorDetail' in str(data):
+        response = json.dumps({
+            'errors': data
+        })
+    response = json.dumps({
+        'data': data
+    })
+
+    return response
+
+
+class Command(BaseCommand):
+    help = "Compares the old and the new `DefaultRenderer` on a large list of serialized `Expense` records."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(0)
+        categories = [choice for choice, _ in Expense.CATEGORY_CHOICES]
+        today = date.today()
+
+        data = [
+            {
+                'id': i,
+                'date': (today - timedelta(days=rnd.randint(0, 2000))).isoformat(),
+                'amount': rnd.randint(1, 5000),
+                'description': f"Expense number {i}",
+                'category': rnd.choice(categories),
+            }
+            for i in range(options['items'])
+        ]
+
+        candidates = [
+            ('legacy (str scan + json.dumps)', lambda: legacy_render(data).encode('utf-8')),
+            ('DRF encoder', lambda: JSONRenderer().render({'data': data}, 'application/json')),
+        ]
+        if orjson is not None:
+            candidates.append(('orjson', lambda: DefaultRenderer().render(data, 'application/json')))
+        else:
+            self.stdout.write(self.style.WARNING("orjson isn't installed, skipping it."))
+
+        baseline = None
+        for name, render in candidates:
+            elapsed = min(timeit.repeat(render, number=1, repeat=options['repeat']))
+            baseline = baseline or elapsed
+            self.stdout.write(f"{name:<32} {elapsed * 1000:9.2f} ms  {baseline / elapsed:6.1f}x  {len(render())} bytes")
@@ -0,0 +1,221 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from copy import copy
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, transaction
+
+from authentication.models import User
+from expenses.models import Expense
+from incomeexpensesapi import ledger, rollups
+
+# SQLite's own defaults, which is what the bare `sqlite3` backend ran with,
+# and the tuned settings.
+SCENARIOS = {
+    'before': {
+        'SQLITE_TRANSACTION_MODE': 'DEFERRED',
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT': '5000',
+        'SQLITE_CACHE_SIZE': '-2000',
+        'SQLITE_MMAP_SIZE': '0',
+    },
+    'after': {
+        'SQLITE_TRANSACTION_MODE': 'IMMEDIATE',
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_SYNCHRONOUS': 'NORMAL',
+        'SQLITE_BUSY_TIMEOUT': '5000',
+        'SQLITE_CACHE_SIZE': '-64000',
+        'SQLITE_MMAP_SIZE': str(256 * 1024 * 1024),
+    },
+}
+
+OPERATIONS = ('read', 'create', 'edit')
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs concurrent worker processes against a standalone SQLite database, reading and writing "
+        "`Expense` records the way the API does, once with SQLite's default settings and `DEFERRED` "
+        "transactions (before) and once with the tuned pragmas and `BEGIN IMMEDIATE` (after), and "
+        "reports the throughput, latencies and `database is locked` errors of each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10, help="Duration of each scenario.")
+        parser.add_argument('--read-ratio', type=float, default=0.5, help="Share of the operations that only read.")
+        parser.add_argument('--records', type=int, default=5000, help="Expenses seeded per worker.")
+        parser.add_argument('--only', choices=SCENARIOS, help="Run a single scenario.")
+        parser.add_argument('--keep', action='store_true', help="Keep the databases, and print where they are.")
+        # Used by the command to run its own worker processes.
+        parser.add_argument('--prepare', action='store_true', help="Internal: migrate and seed the database.")
+        parser.add_argument('--worker', type=int, help="Internal: run as the worker with this index.")
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            return self.prepare(options['workers'], options['records'])
+        if options['worker'] is not None:
+            return self.work(options['worker'], options['seconds'], options['read_ratio'])
+
+        directory = tempfile.mkdtemp(prefix='sqlite-concurrency-')
+        template = os.path.join(directory, 'template.sqlite3')
+        try:
+            self.stdout.write(f"Seeding {options['records']} expenses for each of {options['workers']} workers...")
+            self.manage(template, SCENARIOS['before'], '--prepare', '--workers', options['workers'],
+                        '--records', options['records'], capture=False)
+
+            results = {}
+            for name, environment in SCENARIOS.items():
+                if options['only'] and name != options['only']:
+                    continue
+                path = os.path.join(directory, f'{name}.sqlite3')
+                shutil.copyfile(template, path)
+                results[name] = self.run_scenario(path, environment, options)
+                self.report(name, results[name], options['seconds'])
+
+            if len(results) == 2:
+                before, after = (self.throughput(results[name], options['seconds']) for name in ('before', 'after'))
+                self.stdout.write(
+                    f"\nthroughput x{after / before:.2f}" if before else "\nno operation succeeded before"
+                )
+        finally:
+            if options['keep']:
+                self.stdout.write(f"Databases kept in {directory}")
+            else:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def manage(self, path, environment, *arguments, capture=True):
+        env = {**os.environ, **environment, 'SQLITE_PATH': path}
+        command = [sys.executable, sys.argv[0], 'benchmark_sqlite_concurrency', *map(str, arguments)]
+        if not capture:
+            subprocess.run(command, env=env, check=True)
+            return None
+        return subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    def run_scenario(self, path, environment, options):
+        workers = [
+            self.manage(path, environment, '--worker', index,
+                        '--seconds', options['seconds'], '--read-ratio', options['read_ratio'])
+            for index in range(options['workers'])
+        ]
+        # Start them all at once, once Django is set up in each.
+        for worker in workers:
+            assert worker.stdout.readline().strip() == 'ready'
+        for worker in workers:
+            worker.stdin.write('go\n')
+            worker.stdin.flush()
+
+        results = [json.loads(worker.communicate()[0]) for worker in workers]
+        return {
+            operation: {
+                'latencies': sorted(latency for result in results for latency in result[operation]['latencies']),
+                'errors': sum(result[operation]['errors'] for result in results),
+            }
+            for operation in OPERATIONS
+        }
+
+    def throughput(self, result, seconds):
+        return sum(len(result[operation]['latencies']) for operation in OPERATIONS) / seconds
+
+    def report(self, name, result, seconds):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{name}: {' '.join(f'{key}={value}' for key, value in SCENARIOS[name].items())}"
+        ))
+        self.stdout.write(f"  {'':<8} {'ops/s':>9} {'errors':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for operation in OPERATIONS:
+            latencies = result[operation]['latencies']
+            self.stdout.write(
+                f"  {operation:<8} {len(latencies) / seconds:9.1f} {result[operation]['errors']:8d} "
+                f"{percentile(latencies, 50) * 1000:9.2f} {percentile(latencies, 99) * 1000:9.2f} "
+                f"{(latencies[-1] if latencies else 0) * 1000:9.2f}"
+            )
+        self.stdout.write(f"  {'total':<8} {self.throughput(result, seconds):9.1f}")
+
+    def prepare(self, workers, records):
+        call_command('migrate', verbosity=0)
+
+        rnd = random.Random(0)
+        today = date.today()
+        categories = [choice for choice, _ in Expense.CATEGORY_CHOICES]
+        for index in range(workers):
+            owner = User.objects.create_user(email=f'worker{index}@example.com', password='password')
+            Expense.objects.bulk_create(
+                Expense(
+                    owner=owner,
+                    date=today - timedelta(days=rnd.randint(0, 365)),
+                    amount=rnd.randint(1, 500),
+                    description='seeded',
+                    category=rnd.choice(categories)
+                )
+                for _ in range(records)
+            )
+        rollups.rebuild(Expense)
+
+    def work(self, index, seconds, read_ratio):
+        owner = User.objects.get(email=f'worker{index}@example.com')
+        expenses = Expense.objects.filter(owner=owner)
+        categories = [choice for choice, _ in Expense.CATEGORY_CHOICES]
+        rnd = random.Random(index)
+
+        def read():
+            # `/expenses/` and `/expenses/category-averages/`
+            list(expenses.order_by('-date', '-id')[:20])
+            rollups.summarize_all(Expense, owner)
+
+        def create():
+            # `LedgerWriteMixin.perform_create`
+            with transaction.atomic():
+                instance = Expense.objects.create(
+                    owner=owner,
+                    date=date.today() - timedelta(days=rnd.randint(0, 365)),
+                    amount=rnd.randint(1, 500),
+                    description='created',
+                    category=rnd.choice(categories)
+                )
+                ledger.record_changes(added=[instance])
+
+        def edit():
+            # A read-modify-write transaction, like `recurring.materialize`:
+            # with `DEFERRED` it starts out as a reader and has to upgrade.
+            with transaction.atomic():
+                instance = expenses.filter(date__gte=date.today() - timedelta(days=rnd.randint(0, 365))).last()
+                if instance is None:
+                    return
+                previous = copy(instance)
+                instance.amount = rnd.randint(1, 500)
+                instance.save()
+                ledger.record_changes(added=[instance], removed=[previous])
+
+        handlers = {'read': read, 'create': create, 'edit': edit}
+        results = {operation: {'latencies': [], 'errors': 0} for operation in OPERATIONS}
+
+        sys.stdout.write('ready\n')
+        sys.stdout.flush()
+        sys.stdin.readline()
+
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            operation = 'read' if rnd.random() < read_ratio else rnd.choice(('create', 'edit'))
+            started = time.perf_counter()
+            try:
+                handlers[operation]()
+            except OperationalError:
+                # `database is locked`
+                results[operation]['errors'] += 1
+            else:
+                results[operation]['latencies'].append(time.perf_counter() - started)
+
+        sys.stdout.write(json.dumps(results))
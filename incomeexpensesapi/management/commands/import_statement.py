@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from incomeexpensesapi.imports import StatementImport
+
+
+class Command(BaseCommand):
+    help = "Imports a CSV/NDJSON bank statement into a user's `Expense` and `Income` records."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Email of the owner of the imported records.")
+        parser.add_argument('--format', choices=StatementImport.FORMATS, help="Guessed from the file extension by default.")
+        parser.add_argument('--kind', choices=StatementImport.KINDS, default='auto')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"There is no user with email {options['user']}.")
+
+        path = options['path']
+        format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        with open(path, encoding='utf-8-sig', newline='') as lines:
+            statement_import = StatementImport(
+                owner, lines, format=format, kind=options['kind'], chunk_size=options['chunk_size']
+            )
+            for progress in statement_import.run():
+                self.stdout.write(
+                    "{rows} rows read: {expenses} expenses, {income} income, {skipped} skipped".format(**progress)
+                )
+
+        for error in statement_import.errors:
+            self.stdout.write(self.style.WARNING(f"  row {error['row']}: {error['error']}"))
+        if statement_import.skipped > len(statement_import.errors):
+            self.stdout.write(self.style.WARNING(f"  ... and {statement_import.skipped - len(statement_import.errors)} more"))
+
+        self.stdout.write(self.style.SUCCESS("Import finished."))
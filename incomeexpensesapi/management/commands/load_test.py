@@ -0,0 +1,105 @@
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from django.core.management.base import BaseCommand, CommandError
+
+PATHS = [
+    '/expenses/',
+    '/expenses/yearly-stats/',
+    '/expenses/category-averages/',
+    '/income/',
+    '/income/source-averages/',
+    '/income/yearly-stats/',
+]
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests a running server with concurrent authenticated GETs and reports the throughput and "
+        "latency percentiles per concurrency level. Run it once against the WSGI deployment, e.g. "
+        "`gunicorn incomeexpensesapi.wsgi -w 4`, and once against the ASGI one, e.g. "
+        "`uvicorn incomeexpensesapi.asgi:application --workers 4`, which serves the same views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="Base URL of the server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--email')
+        parser.add_argument('--password')
+        parser.add_argument('--token', help="Access token to use instead of logging in with --email/--password.")
+        parser.add_argument('--path', action='append', dest='paths', help="Endpoint to request instead of the defaults, repeatable.")
+        parser.add_argument('--concurrency', default='1,8,32,64', help="Comma separated numbers of concurrent clients.")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per concurrency level.")
+        parser.add_argument(
+            '--bust-cache',
+            action='store_true',
+            help="Make every URL unique, so the per-user response cache never answers."
+        )
+
+    def handle(self, *args, **options):
+        base_url = options['url'].rstrip('/')
+        token = options['token'] or self.login(base_url, options['email'], options['password'])
+        paths = options['paths'] or PATHS
+        headers = {'Authorization': f'Bearer {token}'}
+
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency takes comma separated numbers.")
+
+        counter = itertools.count()
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.headers.update(headers)
+
+            n = next(counter)
+            url = base_url + paths[n % len(paths)]
+            params = {'_': n} if options['bust_cache'] else None
+
+            started = time.perf_counter()
+            try:
+                ok = local.session.get(url, params=params, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        self.stdout.write(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+        for level in levels:
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                # warm up every client's connection first
+                list(pool.map(fetch, range(level)))
+
+                started = time.perf_counter()
+                results = list(pool.map(fetch, range(options['requests'])))
+                elapsed = time.perf_counter() - started
+
+            latencies = sorted(latency for latency, _ in results)
+            errors = sum(not ok for _, ok in results)
+
+            self.stdout.write(
+                f"{level:>8} {len(results):>9} {errors:>7} {len(results) / elapsed:>9.1f} "
+                f"{statistics.median(latencies) * 1000:>9.1f} "
+                f"{percentile(latencies, 95) * 1000:>9.1f} "
+                f"{percentile(latencies, 99) * 1000:>9.1f}"
+            )
+
+    def login(self, base_url, email, password):
+        if not email or not password:
+            raise CommandError("Either --token or both --email and --password are required.")
+
+        response = requests.post(f'{base_url}/auth/login/', data={'email': email, 'password': password}, timeout=60)
+        if response.status_code != 200:
+            raise CommandError(f"Logging in failed ({response.status_code}): {response.text}")
+        return response.json()['tokens']['access']
@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from incomeexpensesapi import recurring
+
+
+class Command(BaseCommand):
+    help = "Creates the `Expense`/`Income` records of every recurring template occurrence due by --date."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Materialize occurrences up to this day (ISO format), today by default.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Templates per transaction.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-records', type=int, default=10000, help="Records per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            until = date.fromisoformat(options['date']) if options['date'] else date.today()
+        except ValueError:
+            raise CommandError(f"Invalid date: {options['date']}")
+
+        for template_model in recurring.RECURRING:
+            name = template_model._meta.verbose_name
+            progress = {'templates': 0, 'created': 0, 'skipped': 0}
+
+            for progress in recurring.materialize(
+                template_model, until,
+                chunk_size=options['chunk_size'], batch_size=options['batch_size'], max_records=options['max_records']
+            ):
+                self.stdout.write("{templates} templates processed, {created} records created".format(**progress))
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {progress['created']} records created from {progress['templates']} due templates."
+            ))
+            if progress['skipped']:
+                self.stdout.write(self.style.WARNING(
+                    f"{name}: {progress['skipped']} templates skipped, see the log."
+                ))
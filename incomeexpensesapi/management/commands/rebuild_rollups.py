@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from incomeexpensesapi import rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the monthly `Expense`/`Income` rollups from scratch, or only reports drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only compare the stored rollups with the ledger tables, don't rewrite anything."
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = False
+
+        for model in rollups.ROLLUPS:
+            name = model._meta.verbose_name
+            drift = rollups.find_drift(model)
+
+            for owner_id, month, key in drift[:20]:
+                self.stdout.write(f"  {name}: owner {owner_id}, {month:%Y-%m}, {key}")
+            if len(drift) > 20:
+                self.stdout.write(f"  ... and {len(drift) - 20} more")
+
+            if drift:
+                drifted = True
+                self.stdout.write(self.style.WARNING(f"{len(drift)} {name} rollup rows have drifted."))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name} rollups are consistent."))
+
+            if not options['check']:
+                rollups.rebuild(model, batch_size=options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(f"{name} rollups rebuilt."))
+
+        if options['check'] and drifted:
+            raise CommandError("Rollups have drifted, run `rebuild_rollups` to fix them.")
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Delivers the queued emails in batches, each over a single connection, retrying failed ones with "
+        "exponential backoff. Any number of workers can run concurrently, each email is claimed by one of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Emails claimed (and sent over one connection) at a time.")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to wait when there is nothing to send.")
+        parser.add_argument('--once', action='store_true', help="Exit once there are no due emails left instead of polling.")
+
+    def handle(self, *args, **options):
+        while True:
+            emails = outbox.claim(options['batch_size'])
+            if not emails:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            sent = outbox.deliver(emails)
+            self.stdout.write(f"{sent} of {len(emails)} emails sent")
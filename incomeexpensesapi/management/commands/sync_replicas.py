@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database onto every one of the DATABASE_REPLICAS with SQLite's online "
+        "backup, a consistent snapshot even while the primary is written to. Replicas lag behind the primary "
+        "by up to --interval plus the time a copy takes, keep that below REPLICA_STICKINESS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1, help="Seconds between copies.")
+        parser.add_argument('--once', action='store_true', help="Copy once and exit instead of repeating.")
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            self.stderr.write("No replicas configured, see SQLITE_REPLICA_PATHS.")
+            return
+
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        timeout = primary['OPTIONS'].get('pragmas', {}).get('busy_timeout', 5000) / 1000
+        while True:
+            started = time.perf_counter()
+            for alias in settings.DATABASE_REPLICAS:
+                self.copy(primary['NAME'], connections[alias].settings_dict['NAME'], timeout)
+            self.stdout.write(
+                f"Copied onto {len(settings.DATABASE_REPLICAS)} replicas in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, target_path, timeout):
+        source = sqlite3.connect(source_path, timeout=timeout)
+        target = sqlite3.connect(target_path, timeout=timeout)
+        try:
+            # Readers of the replica keep reading from the previous snapshot
+            # while it is replaced, as long as it is in WAL mode.
+            target.execute('PRAGMA journal_mode=WAL')
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
@@ -0,0 +1,397 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', "Requests by route, method and status.", None),
+    'http_request_duration_seconds': (
+        'histogram', "Time spent on requests by route and method.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    ),
+    'http_response_size_bytes': (
+        'histogram', "Response body sizes by route and method.",
+        (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+    ),
+    'db_queries_per_request': (
+        'histogram', "Queries made by the requests measured by `QueryTimingMiddleware`.",
+        (0, 1, 2, 3, 5, 10, 20, 50, 100)
+    ),
+    'db_query_seconds_total': ('counter', "SQL time of the requests measured by `QueryTimingMiddleware`.", None),
+    'cache_requests_total': ('counter', "Cache lookups by cache and result.", None),
+    'cache_entries': ('gauge', "Entries held by the in-process caches.", None),
+}
+
+# Any other method is recorded as `other`, so clients can't create series.
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'}
+
+LEDGER_CACHE_HIT = (('cache', 'ledger'), ('result', 'hit'))
+LEDGER_CACHE_MISS = (('cache', 'ledger'), ('result', 'miss'))
+
+
+class Registry:
+    """
+    Counters, gauges and histograms of the current process, keyed by metric
+    name and a tuple of `(label, value)` pairs.
+
+    Recording only updates dicts of this process under a lock. Every
+    `METRICS_FLUSH_INTERVAL` seconds the whole registry is written to a file
+    of its own in `METRICS_DIR`, and `collect` sums the files of all the
+    processes, so any worker can answer a scrape for all of them. Counters
+    and histograms are cumulative: those of exited processes are merged
+    into a single `retired.json` as they are found, and their gauges
+    dropped. Clear the directory on deploys to start over.
+    """
+
+    def __init__(self):
+        self.collectors = []
+        self.reset()
+
+    def reset(self):
+        # Also called in forked children, which must not report (nor write
+        # to the file of) their parent, nor wait for a lock one of its other
+        # threads held when forking.
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+        self.histograms = {}
+        self.requests = {}
+        self.flushed_at = time.monotonic()
+        self.flush_interval = settings.METRICS_FLUSH_INTERVAL
+        self.flushing = False
+        self.path = None
+
+    def inc(self, name, labels=(), amount=1):
+        with self.lock:
+            self.values[name, labels] += amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            counts = self.histograms.get((name, labels))
+            if counts is None:
+                # one count per bucket, the `+Inf` one and the sum
+                counts = self.histograms[name, labels] = [0] * (len(buckets) + 2)
+            counts[bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def record_request(self, route, method, status, duration, size, recorder=None):
+        """
+        Everything `MetricsMiddleware` records about a request. Kept apart
+        from the other metrics, in one `RequestSeries` per route and method,
+        so recording is a single dict lookup under the lock.
+        """
+
+        with self.lock:
+            series = self.requests.get((route, method))
+            if series is None:
+                series = self.requests[route, method] = RequestSeries()
+            series.record(status, duration, size, recorder)
+
+            if time.monotonic() - self.flushed_at < self.flush_interval or self.flushing:
+                return
+            self.flushing = True
+
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            values = [[name, labels, value] for (name, labels), value in self.values.items()]
+            histograms = [[name, labels, list(counts)] for (name, labels), counts in self.histograms.items()]
+            for (route, method), series in self.requests.items():
+                series.dump((('route', route), ('method', method)), values, histograms)
+
+        for collector in self.collectors:
+            values.extend([name, labels, value] for name, labels, value in collector())
+        return {'values': values, 'histograms': histograms}
+
+    def flush(self):
+        # Best effort: an unwritable `METRICS_DIR` must not fail requests,
+        # the values are kept and written with the next flush.
+        try:
+            if self.path is None:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                # Unique per process, even if its pid gets reused later.
+                self.path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}-{time.time_ns()}.json')
+
+            snapshot = self.snapshot()
+            with open(f'{self.path}.tmp', 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(f'{self.path}.tmp', self.path)
+        except OSError:
+            pass
+        finally:
+            self.flushed_at = time.monotonic()
+            self.flushing = False
+
+    def collect(self):
+        """
+        The registries of all the processes summed, as `(values, histograms,
+        current)` dicts keyed by `(name, labels)`, `current` holding the
+        values of the running processes only. Gauges are only in there.
+        """
+
+        self.flush()
+
+        values = defaultdict(float)
+        current = defaultdict(float)
+        histograms = {}
+        # Only one process at a time merges the files of the exited ones,
+        # and nobody reads them meanwhile.
+        with locked(os.path.join(settings.METRICS_DIR, '.lock')):
+            try:
+                retire(glob.glob(os.path.join(settings.METRICS_DIR, '*-*.json')))
+            except OSError:
+                # unwritable, scrapes still add up the files
+                pass
+
+            for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+                snapshot = read_snapshot(path)
+                if snapshot is None:
+                    continue
+
+                running = path != retired_path()
+                for name, labels, value in snapshot['values']:
+                    key = (name, tuple(map(tuple, labels)))
+                    values[key] += value
+                    if running:
+                        current[key] += value
+                add_histograms(histograms, snapshot['histograms'])
+
+        return values, histograms, current
+
+
+@contextmanager
+def locked(path):
+    try:
+        lock = open(path, 'a')
+    except OSError:
+        yield
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def retired_path():
+    return os.path.join(settings.METRICS_DIR, 'retired.json')
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def add_histograms(histograms, counts_by_key):
+    for name, labels, counts in counts_by_key:
+        key = (name, tuple(map(tuple, labels)))
+        if key in histograms:
+            histograms[key] = [a + b for a, b in zip(histograms[key], counts)]
+        else:
+            histograms[key] = counts
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # alive, as someone else
+        pass
+    return True
+
+
+def retire(paths):
+    """
+    Merges the counters and histograms of the `{pid}-{time}.json` files of
+    exited processes into `retired.json` and deletes them. Their gauges are
+    dropped, nothing holds those entries anymore. Called under the lock.
+    """
+
+    exited = [path for path in paths if not running(int(os.path.basename(path).split('-')[0]))]
+    if not exited:
+        return
+
+    retired = read_snapshot(retired_path()) or {'values': [], 'histograms': []}
+    values = defaultdict(float)
+    for name, labels, value in retired['values']:
+        values[name, tuple(map(tuple, labels))] += value
+    histograms = {}
+    add_histograms(histograms, retired['histograms'])
+
+    for path in exited:
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            continue
+        for name, labels, value in snapshot['values']:
+            if METRICS[name][0] != 'gauge':
+                values[name, tuple(map(tuple, labels))] += value
+        add_histograms(histograms, snapshot['histograms'])
+
+    with open(f'{retired_path()}.tmp', 'w') as f:
+        json.dump({
+            'values': [[name, labels, value] for (name, labels), value in values.items()],
+            'histograms': [[name, labels, counts] for (name, labels), counts in histograms.items()],
+        }, f)
+    os.replace(f'{retired_path()}.tmp', retired_path())
+    for path in exited:
+        os.remove(path)
+
+
+class RequestSeries:
+    """
+    The request metrics of one route and method: counts per status, the
+    duration, size and query histograms and the SQL time.
+    """
+
+    durations = METRICS['http_request_duration_seconds'][2]
+    sizes = METRICS['http_response_size_bytes'][2]
+    queries = METRICS['db_queries_per_request'][2]
+
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        # one count per bucket, the `+Inf` one and the sum
+        self.duration_counts = [0] * (len(self.durations) + 2)
+        self.size_counts = [0] * (len(self.sizes) + 2)
+        self.query_counts = [0] * (len(self.queries) + 2)
+        self.sql_seconds = 0.0
+
+    def record(self, status, duration, size, recorder):
+        self.statuses[status] += 1
+        self.duration_counts[bisect_left(self.durations, duration)] += 1
+        self.duration_counts[-1] += duration
+        self.size_counts[bisect_left(self.sizes, size)] += 1
+        self.size_counts[-1] += size
+        if recorder is not None:
+            self.query_counts[bisect_left(self.queries, recorder.count)] += 1
+            self.query_counts[-1] += recorder.count
+            self.sql_seconds += recorder.duration
+
+    def dump(self, labels, values, histograms):
+        values.extend(
+            ['http_requests_total', labels + (('status', str(status)),), count]
+            for status, count in self.statuses.items()
+        )
+        histograms.append(['http_request_duration_seconds', labels, list(self.duration_counts)])
+        histograms.append(['http_response_size_bytes', labels, list(self.size_counts)])
+        if self.query_counts[-1] or any(self.query_counts[:-1]):
+            histograms.append(['db_queries_per_request', labels, list(self.query_counts)])
+            values.append(['db_query_seconds_total', labels, self.sql_seconds])
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+atexit.register(lambda: registry.path and registry.flush())
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render():
+    """
+    All the processes' metrics in the Prometheus text exposition format, plus
+    the `cache_hit_ratio` of each cache over the running processes.
+    """
+
+    values, histograms, current = registry.collect()
+
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+
+        if kind != 'histogram':
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+            continue
+
+        for (metric, labels), counts in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([format_value(bound) for bound in buckets] + ['+Inf'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_value(counts[-1])}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+
+    lookups = defaultdict(lambda: [0, 0])
+    for (metric, labels), value in current.items():
+        if metric == 'cache_requests_total':
+            labels = dict(labels)
+            lookups[labels['cache']][labels['result'] == 'hit'] += value
+
+    lines += ['# HELP cache_hit_ratio Share of the cache lookups that hit.', '# TYPE cache_hit_ratio gauge']
+    for cache, (misses, hits) in sorted(lookups.items()):
+        if hits + misses:
+            lines.append(f'cache_hit_ratio{format_labels((("cache", cache),))} {hits / (hits + misses):.4f}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Records the route, method, status, duration and response size of every
+    request in the `registry`, plus its queries when `QueryTimingMiddleware`
+    (which must come after this one) measured them. Routes are the URL
+    patterns, e.g. `/expenses/<int:id>/`, and unknown methods `other`, so the
+    label values stay bounded.
+
+    Streamed responses are recorded once the stream is exhausted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self.stream(response.streaming_content, request, response, started)
+        else:
+            self.record(request, response, started, len(response.content))
+        return response
+
+    def stream(self, content, request, response, started):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record(request, response, started, size)
+
+    def record(self, request, response, started, size):
+        match = request.resolver_match
+        registry.record_request(
+            f'/{match.route}' if match is not None else 'unmatched',
+            request.method if request.method in HTTP_METHODS else 'other',
+            response.status_code,
+            time.perf_counter() - started,
+            size,
+            getattr(request, 'sql_recorder', None)
+        )
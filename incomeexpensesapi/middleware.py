@@ -0,0 +1,160 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('incomeexpensesapi.sql')
+
+
+class QueryRecorder:
+    """
+    `execute_wrapper` counting and timing every statement run while it's
+    installed, and keeping the slowest one. The statements themselves are
+    only collected up to `limit`, for the requests found over budget.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = None
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+
+            query = (elapsed, context['connection'].alias, sql, params, many)
+            if self.slowest is None or elapsed > self.slowest[0]:
+                self.slowest = query
+            if len(self.queries) < self.limit:
+                self.queries.append(query)
+
+    def install(self):
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+
+
+class QueryTimingMiddleware:
+    """
+    Records the queries of a `SQL_TIMING_SAMPLE_RATE` share of the requests
+    through an `execute_wrapper` (so it works with `DEBUG` off, at the cost
+    of two clock reads per statement) and reports their count, total time
+    and the slowest one:
+
+    - in a `Server-Timing` header (`db`, `db-slowest` and the whole
+      request as `app`), unless `SQL_TIMING_HEADER` is off,
+    - in a JSON log line of the `incomeexpensesapi.sql` logger, at `INFO`
+      (off by default, see `SQL_TIMING_LOG_LEVEL`).
+
+    Requests making more than `SQL_TIMING_QUERY_BUDGET` queries or spending
+    more than `SQL_TIMING_TIME_BUDGET` ms in them are logged as warnings,
+    with every statement and the plans of their slowest `SELECT`s.
+
+    Queries of streamed responses run after the headers are sent, so they
+    are only in the log line, written once the stream is exhausted.
+    """
+
+    # statements kept for the over budget report, and the slowest of them explained
+    max_queries = 200
+    max_explained = 5
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(self.max_queries)
+        # for `MetricsMiddleware`
+        request.sql_recorder = recorder
+        started = time.perf_counter()
+        recorder.install()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            recorder.uninstall()
+            raise
+
+        if response.streaming:
+            response.streaming_content = self.stream(response.streaming_content, recorder, request, response, started)
+        else:
+            recorder.uninstall()
+            self.report(recorder, request, response, time.perf_counter() - started)
+
+        if settings.SQL_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'db;desc="{recorder.count} queries";dur={recorder.duration * 1000:.2f}',
+                f'db-slowest;dur={recorder.slowest[0] * 1000 if recorder.slowest else 0:.2f}',
+                f'app;dur={(time.perf_counter() - started) * 1000:.2f}',
+            ])
+        return response
+
+    def stream(self, content, recorder, request, response, started):
+        try:
+            yield from content
+        finally:
+            recorder.uninstall()
+            self.report(recorder, request, response, time.perf_counter() - started)
+
+    def report(self, recorder, request, response, elapsed):
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 2),
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 2),
+        }
+        if recorder.slowest:
+            entry['slowest'] = {'sql': recorder.slowest[2], 'ms': round(recorder.slowest[0] * 1000, 2)}
+
+        over_budget = (
+            recorder.count > settings.SQL_TIMING_QUERY_BUDGET
+            or recorder.duration * 1000 > settings.SQL_TIMING_TIME_BUDGET
+        )
+        if not over_budget:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps(entry))
+            return
+
+        entry['statements'] = [
+            {'alias': alias, 'sql': sql, 'ms': round(duration * 1000, 2), 'many': many}
+            for duration, alias, sql, params, many in recorder.queries
+        ]
+
+        # Plans of the slowest distinct reads, run after the request so they
+        # aren't counted in it.
+        plans = {}
+        for duration, alias, sql, params, many in sorted(recorder.queries, key=lambda query: -query[0]):
+            if len(plans) == self.max_explained:
+                break
+            if not many and sql not in plans and sql.lstrip().upper().startswith('SELECT'):
+                plans[sql] = explain(alias, sql, params)
+        entry['plans'] = [{'sql': sql, 'plan': plan} for sql, plan in plans.items()]
+
+        logger.warning(json.dumps(entry, default=str))
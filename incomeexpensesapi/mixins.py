@@ -0,0 +1,36 @@
+from copy import copy
+
+from django.db import transaction
+
+from . import ledger
+
+
+class LedgerWriteMixin:
+    """
+    Saves and deletes `Expense`/`Income` records in the same transaction as
+    everything derived from them, see `ledger.record_changes`.
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            instance = serializer.save(owner=self.request.user)
+            ledger.record_changes(added=[instance])
+        return instance
+
+    def perform_bulk_create(self, serializer):
+        with transaction.atomic():
+            instances = serializer.save(owner=self.request.user)
+            ledger.record_changes(added=instances)
+        return instances
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            previous = copy(serializer.instance)
+            instance = serializer.save()
+            ledger.record_changes(added=[instance], removed=[previous])
+        return instance
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            ledger.record_changes(removed=[instance])
+            instance.delete()
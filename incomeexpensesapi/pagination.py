@@ -0,0 +1,155 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date
+
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import pagination
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LedgerPagination(pagination.PageNumberPagination):
+    """
+    Page number pagination for `Expense`/`Income` lists with an opt-in keyset
+    (cursor) mode.
+
+    Passing `?pagination=cursor` (or a `cursor` obtained from a previous page)
+    orders the records by `(-date, -id)` and continues right after the last
+    record seen. Pages are fetched straight from the `(owner, date)` index,
+    there is no `COUNT(*)` and no `OFFSET`, so deep pages cost the same as
+    the first one. Without these parameters the old page number behaviour is
+    left untouched.
+    """
+
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-date', '-id')
+    invalid_cursor_message = _('Invalid cursor')
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.mode_query_param)
+
+        position, reverse = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.cursor_ordering)
+        if position:
+            day, pk = position
+            if reverse:
+                queryset = queryset.filter(date__gte=day).exclude(date=day, id__lte=pk).reverse()
+            else:
+                queryset = queryset.filter(date__lte=day).exclude(date=day, id__gte=pk)
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            day, pk, reverse = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('.')
+            return (date.fromisoformat(day), int(pk)), reverse == 'r'
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        position = f"{instance.date.isoformat()}.{instance.id}.{'r' if reverse else 'f'}"
+        encoded = urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_html_context(self):
+        if not self.keyset:
+            return super().get_html_context()
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link()
+        }
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            coreapi.Field(
+                name=self.mode_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Pagination mode',
+                    description="`cursor` switches to keyset pagination, with no total count."
+                )
+            ),
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Cursor',
+                    description="The pagination cursor value, taken from the `next`/`previous` links."
+                )
+            )
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "`cursor` switches to keyset pagination, with no total count.",
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "The pagination cursor value, taken from the `next`/`previous` links.",
+                'schema': {'type': 'string'},
+            },
+        ]
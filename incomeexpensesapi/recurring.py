@@ -0,0 +1,178 @@
+import calendar
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+
+from expenses.models import Expense, RecurringExpense
+from income.models import Income, RecurringIncome
+
+from . import ledger
+from .rollups import month_of, next_month
+
+logger = logging.getLogger(__name__)
+
+# Maps every recurring template model onto the ledger model it materializes
+# and the category/source field the two share.
+RECURRING = {
+    RecurringExpense: (Expense, 'category'),
+    RecurringIncome: (Income, 'source'),
+}
+
+
+def day_in_month(month, day):
+    """
+    The `day` of `month`, or its last day if `month` is shorter than that.
+    """
+
+    return month.replace(day=min(day, calendar.monthrange(month.year, month.month)[1]))
+
+
+def within_end(template, day):
+    if template.end_date is not None and day > template.end_date:
+        return None
+    return day
+
+
+def first_occurrence(template, not_before=None):
+    """
+    The first occurrence of `template` on or after both its `start_date` and
+    `not_before`, or `None` if there is none before its `end_date`.
+    """
+
+    start = max(template.start_date, not_before or template.start_date)
+
+    if template.frequency == 'WEEKLY':
+        day = start + timedelta(days=(template.start_date.weekday() - start.weekday()) % 7)
+    else:
+        day_of_month = template.day_of_month or template.start_date.day
+        day = day_in_month(month_of(start), day_of_month)
+        if day < start:
+            day = day_in_month(next_month(month_of(start)), day_of_month)
+
+    return within_end(template, day)
+
+
+def next_occurrence(template, day):
+    """
+    The occurrence of `template` following the one on `day`, or `None` if it
+    would be after its `end_date`.
+    """
+
+    if template.frequency == 'WEEKLY':
+        return within_end(template, day + timedelta(days=7))
+
+    day_of_month = template.day_of_month or template.start_date.day
+    return within_end(template, day_in_month(next_month(month_of(day)), day_of_month))
+
+
+def materialize(template_model, until, chunk_size=1000, batch_size=1000, max_records=10000, max_retries=3):
+    """
+    Creates a ledger record for every occurrence of the `template_model`
+    templates due on or before `until`, including the ones missed by earlier
+    runs, and moves each template's `next_date` past them.
+
+    Due templates are walked in `chunk_size` batches by primary key, and a
+    chunk stops at `max_records` occurrences (a template with more of them,
+    e.g. a weekly one started decades ago, is resumed by the next chunk), so
+    memory stays bounded however many there are. Each chunk is written in
+    its own transaction with `bulk_create`, together with the advanced
+    `next_date`s, so rerunning (or resuming after a crash) never creates an
+    occurrence twice. The unique (recurring, date) constraint of the ledger
+    table backs this up against concurrent runs: a chunk conflicting with one
+    is rolled back and redone without the occurrences already written.
+
+    A chunk failing `max_retries` times in a row is redone one template at
+    a time, and a template that keeps failing on its own is logged and
+    skipped, it stays due for the next run.
+
+    Yields the cumulative number of templates processed, records created and
+    templates skipped after every chunk.
+    """
+
+    ledger_model, field = RECURRING[template_model]
+    due = template_model.objects.filter(next_date__lte=until).order_by('id')
+
+    last_id = 0
+    size = chunk_size
+    # Walked one template at a time up to this id, after a failing chunk.
+    narrowed_until = None
+    failures = 0
+    progress = {'templates': 0, 'created': 0, 'skipped': 0}
+
+    while True:
+        templates = list(due.filter(id__gt=last_id)[:size])
+        if not templates:
+            return
+
+        try:
+            with transaction.atomic():
+                existing = set(ledger_model.objects.filter(
+                    recurring__in=templates,
+                    date__gte=min(template.next_date for template in templates)
+                ).values_list('recurring_id', 'date'))
+
+                records = []
+                advanced = defaultdict(list)
+                finished = 0
+                for template in templates:
+                    day = template.next_date
+                    while day is not None and day <= until and len(records) < max_records:
+                        if (template.id, day) not in existing:
+                            records.append(ledger_model(
+                                owner_id=template.owner_id,
+                                recurring_id=template.id,
+                                date=day,
+                                amount=template.amount,
+                                description=template.description,
+                                **{field: getattr(template, field)}
+                            ))
+                        day = next_occurrence(template, day)
+                    advanced[day].append(template.id)
+
+                    if day is not None and day <= until:
+                        # Out of room, the rest of its occurrences go into
+                        # the next chunk.
+                        resume_after = template.id - 1
+                        break
+                    finished += 1
+                    resume_after = template.id
+
+                ledger_model.objects.bulk_create(records, batch_size=batch_size)
+                # Far fewer distinct next dates than templates, one `UPDATE`
+                # each is much cheaper than `bulk_update`'s per row `CASE`.
+                for day, ids in advanced.items():
+                    template_model.objects.filter(id__in=ids).update(next_date=day)
+                ledger.record_changes(added=records)
+        except IntegrityError:
+            # A concurrent run has materialized some of these, redo the chunk.
+            failures += 1
+            if failures < max_retries:
+                continue
+
+            failures = 0
+            if len(templates) > 1:
+                size = 1
+                narrowed_until = templates[-1].id
+                continue
+
+            logger.warning(
+                "Skipping %s %s: its occurrences failed to be written %s times in a row.",
+                template_model._meta.verbose_name, templates[0].id, max_retries, exc_info=True
+            )
+            resume_after = templates[0].id
+            finished = 0
+            records = []
+            progress['skipped'] += 1
+        else:
+            failures = 0
+
+        last_id = resume_after
+        if narrowed_until is not None and last_id >= narrowed_until:
+            size = chunk_size
+            narrowed_until = None
+
+        progress['templates'] += finished
+        progress['created'] += len(records)
+        yield dict(progress)
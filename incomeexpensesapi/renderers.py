@@ -1,20 +1,38 @@
 from rest_framework import renderers
-import json
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class DefaultRenderer(renderers.JSONRenderer):
+    """
+    Wraps the payload into `{"data": ...}` and encodes it straight to bytes.
+    Error responses (told apart by their status, so the payload is never
+    stringified and scanned for them) are rendered as they are.
+
+    `orjson` gets used for encoding whenever it is installed, falling back
+    to the stock DRF encoder otherwise, and for indented output (e.g.
+    `?indent=` or the browsable API): `orjson` can't indent by arbitrary
+    amounts.
+    """
 
     charset = 'utf-8'
+    use_orjson = orjson is not None
+
+    def is_error(self, renderer_context):
+        response = (renderer_context or {}).get('response')
+        if response is None:
+            return False
+        return response.exception or response.status_code >= 400
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
 
-        response = ''
+        payload = data if self.is_error(renderer_context) else {'data': data}
 
-        if 'ErrorDetail' in str(data):
-            response = json.dumps({
-                'errors': data
-            })
-        response = json.dumps({
-            'data': data
-        })
+        if self.use_orjson and not self.get_indent(accepted_media_type, renderer_context or {}):
+            return orjson.dumps(payload, default=JSONEncoder().default, option=orjson.OPT_NON_STR_KEYS)
 
-        return response 
+        return super().render(payload, accepted_media_type, renderer_context)
@@ -0,0 +1,171 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from expenses.models import Expense, ExpenseMonthlyRollup
+from income.models import Income, IncomeMonthlyRollup
+
+from .aggregates import merge, summarize
+
+# Maps every ledger model onto its monthly rollup model and the field the
+# rollup is grouped by.
+ROLLUPS = {
+    Expense: (ExpenseMonthlyRollup, 'category'),
+    Income: (IncomeMonthlyRollup, 'source'),
+}
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def track(added=(), removed=()):
+    """
+    Applies newly written (`added`) and deleted or overwritten (`removed`)
+    ledger records to the rollups. Deltas are merged per rollup row first,
+    so a bulk write costs one `UPDATE` per touched (owner, month, key) rather
+    than one per record. Must be called inside the writing transaction.
+    """
+
+    deltas = defaultdict(lambda: [0, 0])
+
+    for sign, instances in ((1, added), (-1, removed)):
+        for instance in instances:
+            _, field = ROLLUPS[type(instance)]
+            delta = deltas[(type(instance), instance.owner_id, month_of(instance.date), getattr(instance, field))]
+            delta[0] += sign * instance.amount
+            delta[1] += sign
+
+    for (model, owner_id, month, key), (amount, records) in deltas.items():
+        if amount or records:
+            apply_delta(model, owner_id, month, key, amount, records)
+
+
+def apply_delta(model, owner_id, month, key, amount, records):
+    rollup_model, field = ROLLUPS[model]
+    lookup = {'owner_id': owner_id, 'month': month, field: key}
+    rows = rollup_model.objects.filter(**lookup)
+
+    changes = {'total': F('total') + amount, 'records': F('records') + records}
+
+    if not rows.update(**changes):
+        if records <= 0:
+            # Nothing to take away from, the rollups have drifted already.
+            # `rebuild_rollups` is the way to fix that.
+            return
+        try:
+            with transaction.atomic():
+                rollup_model.objects.create(total=amount, records=records, **lookup)
+        except IntegrityError:
+            # Another request has just created the same row.
+            rows.update(**changes)
+
+    if records < 0:
+        rows.filter(records__lte=0).delete()
+
+
+def summarize_all(model, owner):
+    """
+    All-time totals of `owner`'s records per category/source, read from
+    the rollups.
+    """
+
+    rollup_model, field = ROLLUPS[model]
+    return summarize(rollup_model.objects.filter(owner=owner), field, amount='total', count='records')
+
+
+def split_window(start, end):
+    """
+    Splits the `start`-`end` date window (inclusive) into a filter on the
+    rollup months lying entirely within it and a filter on the ledger dates
+    of the partial months at both edges.
+    """
+
+    first_full = month_of(start) if start.day == 1 else next_month(month_of(start))
+    after_full = next_month(month_of(end)) if end == next_month(month_of(end)) - timedelta(days=1) else month_of(end)
+
+    if first_full >= after_full:
+        return Q(pk__in=[]), Q(date__gte=start, date__lte=end)
+
+    return (
+        Q(month__gte=first_full, month__lt=after_full),
+        Q(date__gte=start, date__lt=first_full) | Q(date__gte=after_full, date__lte=end)
+    )
+
+
+def summarize_window(model, owner, start, end):
+    """
+    Totals of `owner`'s records dated within `start` and `end` (inclusive)
+    per category/source.
+
+    Months lying entirely within the window are read from the rollups, while
+    the partial months at both edges are summed from the ledger table itself.
+    Every category/source the owner has ever used is returned, the ones with
+    no records within the window having zero totals.
+    """
+
+    rollup_model, field = ROLLUPS[model]
+    full_months, edges = split_window(start, end)
+
+    return merge(
+        summarize(rollup_model.objects.filter(owner=owner), field, amount='total', count='records', condition=full_months),
+        summarize(model.objects.filter(edges, owner=owner), field)
+    )
+
+
+def expected_rollups(model):
+    """
+    Yields the rollup rows of `model` as computed from scratch.
+    """
+
+    rollup_model, field = ROLLUPS[model]
+
+    rows = model.objects.order_by().annotate(
+        month=TruncMonth('date')
+    ).values('owner_id', 'month', field).annotate(
+        total=Sum('amount'),
+        records=Count('id')
+    )
+
+    for row in rows.iterator():
+        yield rollup_model(**row)
+
+
+def find_drift(model):
+    """
+    Returns the (owner, month, key) triples whose stored rollup differs from
+    the one computed from the ledger table.
+    """
+
+    rollup_model, field = ROLLUPS[model]
+
+    stored = {
+        (row.owner_id, row.month, getattr(row, field)): (row.total, row.records)
+        for row in rollup_model.objects.iterator()
+    }
+
+    drift = []
+    for row in expected_rollups(model):
+        key = (row.owner_id, row.month, getattr(row, field))
+        if stored.pop(key, None) != (row.total, row.records):
+            drift.append(key)
+
+    return drift + list(stored)
+
+
+@transaction.atomic
+def rebuild(model, batch_size=1000):
+    """
+    Throws away every rollup of `model` and recomputes them from scratch.
+    """
+
+    rollup_model, _ = ROLLUPS[model]
+    rollup_model.objects.all().delete()
+    rollup_model.objects.bulk_create(expected_rollups(model), batch_size=batch_size)
@@ -0,0 +1,156 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+
+class Routing:
+    """
+    Where the reads of the current request go: the `replica` picked for it,
+    unless it must read from the primary.
+    """
+
+    def __init__(self, replica, primary):
+        self.replica = replica
+        self.primary = primary
+        self.wrote = False
+
+
+routing = ContextVar('routing', default=None)
+
+
+def pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the requests `ReplicaMiddleware` marks read-only to a
+    replica out of `DATABASE_REPLICAS`, and everything else to the primary
+    (`default`):
+
+    - all writes,
+    - the reads of unsafe requests, of views outside `REPLICA_READ_VIEWS`,
+      and of requests by users who wrote in the last `REPLICA_STICKINESS`
+      seconds, so users always read their own writes,
+    - reads of users, who must be found from the first request after they
+      sign up (the user cache spares most of these reads),
+    - reads after a write, or within a transaction, in the same request,
+    - reads outside of requests, e.g. by management commands.
+
+    Replicas aren't migrated: they are copies of the primary, see
+    `sync_replicas`.
+    """
+
+    def db_for_read(self, model, **hints):
+        current = routing.get()
+        if current is None:
+            return None
+        if current.primary or connections[DEFAULT_DB_ALIAS].in_atomic_block or model is get_user_model():
+            return DEFAULT_DB_ALIAS
+        return current.replica
+
+    def db_for_write(self, model, **hints):
+        current = routing.get()
+        if current is not None:
+            current.wrote = True
+            current.primary = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Decides where the reads of every request go, see `ReplicaRouter`: safe
+    requests to the views named in `REPLICA_READ_VIEWS` read from a random
+    replica, unless their user wrote within the last `REPLICA_STICKINESS`
+    seconds. Every other view reads from the primary, it may well write
+    what it read.
+
+    Users are told apart by the `user_id` of their access token (validated,
+    which doesn't touch the database, before the view authenticates the
+    request). Their writes are remembered ("pinned") in the default cache,
+    which must be shared by all the processes (see the
+    `incomeexpensesapi.E002` check):
+
+    - unsafe requests pin their user before the view runs, so concurrent
+      reads can't cache what a replica had before the commit, and again
+      once they are over, counting `REPLICA_STICKINESS` from there,
+    - streamed responses, which write once the view has returned, pin it
+      once more when the stream is exhausted,
+    - safe requests pin their user once over if they wrote.
+
+    Does nothing without `DATABASE_REPLICAS`. Streamed responses read from
+    the primary once the view has returned.
+    """
+
+    authentication = JWTAuthentication()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        user_id = self.get_user_id(request)
+        unsafe = request.method not in SAFE_METHODS
+        if unsafe and user_id is not None:
+            self.pin(user_id)
+        primary = unsafe or (user_id is not None and cache.get(pin_key(user_id)))
+        current = Routing(random.choice(settings.DATABASE_REPLICAS), primary)
+
+        token = routing.set(current)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+
+        if user_id is not None and (current.wrote or unsafe):
+            self.pin(user_id)
+            if response.streaming:
+                response.streaming_content = self.pin_after(response.streaming_content, user_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current = routing.get()
+        if current is not None and request.resolver_match.view_name not in settings.REPLICA_READ_VIEWS:
+            current.primary = True
+
+    def pin(self, user_id):
+        cache.set(pin_key(user_id), True, settings.REPLICA_STICKINESS)
+
+    def pin_after(self, content, user_id):
+        try:
+            yield from content
+        finally:
+            self.pin(user_id)
+
+    def get_user_id(self, request):
+        header = self.authentication.get_header(request)
+        if header is None:
+            return None
+        try:
+            raw_token = self.authentication.get_raw_token(header)
+            if raw_token is None:
+                return None
+            return self.authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+        except AuthenticationFailed:
+            # Left to the view to reject.
+            return None
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from rest_framework import serializers
+
+from .recurring import first_occurrence
+
+
+# Largest amount a `PositiveIntegerField` holds on every database.
+MAX_AMOUNT = 2147483647
+
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+    """
+    `many=True` serializer inserting all of the validated items with a single
+    `bulk_create` instead of one `INSERT` per item.
+    """
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create([model(**attrs) for attrs in validated_data])
+
+
+class RecurringSerializer(serializers.ModelSerializer):
+    """
+    Base for the `RecurringExpense`/`RecurringIncome` serializers, keeping the
+    template's `next_date` in step with its schedule.
+    """
+
+    def validate(self, attrs):
+        frequency = attrs.get('frequency', getattr(self.instance, 'frequency', None))
+        day_of_month = attrs.get('day_of_month', getattr(self.instance, 'day_of_month', None))
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+
+        if day_of_month is not None and frequency != 'MONTHLY':
+            raise serializers.ValidationError({'day_of_month': ['Only monthly templates have a day of month.']})
+        if end_date is not None and end_date < start_date:
+            raise serializers.ValidationError({'end_date': ['Must not be before `start_date`.']})
+
+        return attrs
+
+    def create(self, validated_data):
+        template = self.Meta.model(**validated_data)
+        template.next_date = first_occurrence(template)
+        template.save()
+        return template
+
+    def update(self, instance, validated_data):
+        # Every occurrence before `next_date` (or up to `end_date`, once
+        # there is no next one) has been materialized already.
+        if instance.next_date is not None:
+            not_before = instance.next_date
+        else:
+            not_before = instance.end_date + timedelta(days=1)
+
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.next_date = first_occurrence(instance, not_before=not_before)
+        instance.save()
+        return instance
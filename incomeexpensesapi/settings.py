@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,12 +48,16 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'drf_yasg',
     # my own
+    'incomeexpensesapi',
     'authentication',
     'expenses',
     'income'
 ]
 
 MIDDLEWARE = [
+    'incomeexpensesapi.metrics.MetricsMiddleware',
+    'incomeexpensesapi.middleware.QueryTimingMiddleware',
+    'incomeexpensesapi.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,14 +90,140 @@ WSGI_APPLICATION = 'incomeexpensesapi.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+# SQLite tuned for several worker processes, see
+# `incomeexpensesapi.backends.sqlite3`: WAL lets reads run alongside the
+# single writer, `synchronous=NORMAL` only syncs at checkpoints in WAL mode
+# (committed transactions survive a crash of the application, not of the
+# OS), writers wait up to SQLITE_BUSY_TIMEOUT ms for each other, and
+# `atomic` blocks take the write lock at `BEGIN IMMEDIATE` so they queue up
+# rather than fail upgrading it. SQLITE_CACHE_SIZE is in KiB when negative,
+# in pages otherwise.
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': 'incomeexpensesapi.backends.sqlite3',
+        'NAME': config('SQLITE_PATH', default=BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'transaction_mode': config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+            'pragmas': {
+                'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+                'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+                'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+                'cache_size': config('SQLITE_CACHE_SIZE', default=-64000, cast=int),
+                'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+            },
+        },
     }
 }
 
+# Read replicas, see `incomeexpensesapi.routers`: the reads of safe requests
+# to the REPLICA_READ_VIEWS (URL names of the ledger list, detail and stats
+# views) go to `replica1`, `replica2`... at SQLITE_REPLICA_PATHS (comma separated),
+# kept up to date by `sync_replicas`. Users who wrote in the last
+# REPLICA_STICKINESS seconds read from the primary, so it must be longer
+# than the replicas lag behind, and the cache must be shared by all the
+# processes for that to hold across them.
+SQLITE_REPLICA_PATHS = config('SQLITE_REPLICA_PATHS', default='', cast=Csv())
+DATABASE_REPLICAS = [f'replica{index}' for index in range(1, len(SQLITE_REPLICA_PATHS) + 1)]
+DATABASES.update({
+    alias: {**DATABASES['default'], 'NAME': path, 'TEST': {'MIRROR': 'default'}}
+    for alias, path in zip(DATABASE_REPLICAS, SQLITE_REPLICA_PATHS)
+})
+DATABASE_ROUTERS = ['incomeexpensesapi.routers.ReplicaRouter']
+REPLICA_STICKINESS = config('REPLICA_STICKINESS', default=5, cast=float)
+REPLICA_READ_VIEWS = {
+    'expenses:list-create',
+    'expenses:single',
+    'expenses:yearly-stats',
+    'expenses:category-averages',
+    'expenses:timeseries',
+    'expenses:analytics',
+    'income:list-create',
+    'income:rud',
+    'income:source-averages',
+    'income:yearly-stats',
+    'income:timeseries',
+    'cashflow',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Every worker process must see the same stats cache: the default, file based,
+# one is shared by the processes of a single host, point CACHE_BACKEND and
+# CACHE_LOCATION at e.g. Redis or Memcached when running on several. Per process
+# backends get the `incomeexpensesapi.W001` warning, and fail `E002` with replicas.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'incomeexpensesapi-cache')),
+    }
+}
+
+LEDGER_CACHE_ALIAS = 'default'
+LEDGER_CACHE_TIMEOUT = config('LEDGER_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
+# In-process cache of the users authenticated by JWT, see
+# `incomeexpensesapi.authentication.CachedJWTAuthentication`. Changes to a
+# user reach the other processes within AUTH_USER_CACHE_SYNC_INTERVAL
+# seconds, through the default cache.
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=float)
+AUTH_USER_CACHE_SYNC_INTERVAL = config('AUTH_USER_CACHE_SYNC_INTERVAL', default=1, cast=float)
+
+
+# Per request SQL instrumentation, see `incomeexpensesapi.middleware`: the
+# share of the requests measured, whether clients get the `Server-Timing`
+# header, and the query count and SQL time (in ms) beyond which a request is
+# logged, as a warning, with all its statements and their plans. Set
+# SQL_TIMING_LOG_LEVEL to INFO to log a line for every measured request.
+SQL_TIMING_SAMPLE_RATE = config('SQL_TIMING_SAMPLE_RATE', default=1.0, cast=float)
+SQL_TIMING_HEADER = config('SQL_TIMING_HEADER', default=True, cast=bool)
+SQL_TIMING_QUERY_BUDGET = config('SQL_TIMING_QUERY_BUDGET', default=20, cast=int)
+SQL_TIMING_TIME_BUDGET = config('SQL_TIMING_TIME_BUDGET', default=200, cast=float)
+
+# Per route metrics, see `incomeexpensesapi.metrics`: every process writes
+# its own every `METRICS_FLUSH_INTERVAL` seconds into `METRICS_DIR`, which
+# `/metrics/` sums up. Scrapers authenticate with the `METRICS_TOKEN` bearer
+# token, without one `/metrics/` only answers local requests in `DEBUG`.
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'incomeexpensesapi-metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'incomeexpensesapi.sql': {
+            'handlers': ['console'],
+            'level': config('SQL_TIMING_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+
+# PBKDF2 work factor (Django 4.1's default), i.e. what a login costs in CPU.
+# Passwords hashed with a different count are rehashed on their next login.
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=390000, cast=int)
+
+PASSWORD_HASHERS = [
+    'authentication.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -136,13 +268,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'incomeexpensesapi.authentication.CachedJWTAuthentication',
     ),
     'NON_FIELD_ERRORS_KEY': 'Error',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Token buckets of the views' `throttle_scope`, per client IP and per
+    # email, see `incomeexpensesapi.throttling`.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': config('THROTTLE_LOGIN_IP', default='30/min'),
+        'login_email': config('THROTTLE_LOGIN_EMAIL', default='10/min'),
+        'signup_ip': config('THROTTLE_SIGNUP_IP', default='10/hour'),
+        'password_reset_ip': config('THROTTLE_PASSWORD_RESET_IP', default='10/hour'),
+        'password_reset_email': config('THROTTLE_PASSWORD_RESET_EMAIL', default='3/hour'),
+    },
+    # Proxies in front of the app whose `X-Forwarded-For` entries are
+    # trusted: the throttles key clients by IP, which mustn't be spoofable.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
+# Where the throttles' buckets live: an SQLite file shared by the worker
+# processes of a host, or `LocMemBucketStore` to keep them per process (as
+# the tests do).
+THROTTLE_STORE = config('THROTTLE_STORE', default='incomeexpensesapi.throttling.SQLiteBucketStore')
+THROTTLE_LOCATION = config(
+    'THROTTLE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'incomeexpensesapi-throttle.sqlite3')
+)
+
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -166,3 +318,12 @@ EMAIL_PORT = 587
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+
+# Delivery of the queued emails by `manage.py send_outbox`, see
+# `authentication.outbox`: attempts per email, the delay (in seconds) before
+# the first retry, doubled with every further one, and how long a worker owns
+# the emails it claimed, at least (see `authentication.outbox.lease`).
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', default=60, cast=int)
+EMAIL_OUTBOX_LEASE = config('EMAIL_OUTBOX_LEASE', default=5 * 60, cast=int)
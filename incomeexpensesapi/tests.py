@@ -0,0 +1,636 @@
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from expenses.models import Expense
+from expenses.views import ExpenseListAPIView
+from income.models import Income
+
+from . import metrics
+from .authentication import SHARED_GENERATION_KEY, UserCache, user_cache
+from .backends.sqlite3.base import DatabaseWrapper
+from .checks import check_ledger_cache, check_replica_pins
+from .imports import StatementImport
+from .management.commands import benchmark_endpoints
+from .middleware import QueryTimingMiddleware
+from .renderers import DefaultRenderer
+from .routers import ReplicaRouter, pin_key
+from .testing import ASGIClient, LedgerAPITestCase
+from .views import StatementImportAPIView
+
+
+class StatementImportTests(LedgerAPITestCase):
+
+    statement = (
+        'date,amount,description,category\n'
+        '2022-01-03,-12.50,groceries,food\n'
+        '2022-01-04,2500,salary,Salary\n'
+        'yesterday,-1,,\n'
+        '2022-01-05,-99999999999,typo,\n'
+    )
+
+    def upload(self, content=None, name='statement.csv'):
+        return SimpleUploadedFile(name, (content or self.statement).encode())
+
+    def lines(self, response):
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_imports_the_valid_rows_and_reports_the_others(self):
+        response = self.client.post('/import/', {'file': self.upload()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        last = self.lines(response)[-1]
+        self.assertEqual(last, {
+            'done': True, 'rows': 4, 'expenses': 1, 'income': 1, 'skipped': 2, 'errors': [
+                {'row': 4, 'error': 'Invalid or missing date.'},
+                {'row': 5, 'error': 'Amount must not exceed 2147483647 either way.'},
+            ]
+        })
+        self.assertEqual(list(Expense.objects.values_list('amount', 'category')), [(13, 'FOOD')])
+        self.assertEqual(list(Income.objects.values_list('amount', 'source')), [(2500, 'SALARY')])
+
+    def test_reports_progress_after_every_chunk(self):
+        content = 'date,amount\n' + '2022-01-03,-1\n' * 5
+        with mock.patch.object(StatementImportAPIView, 'chunk_size', 2):
+            response = self.client.post('/import/', {'file': self.upload(content)})
+
+        self.assertEqual([line['expenses'] for line in self.lines(response)], [2, 4, 5, 5])
+
+    def test_a_database_error_ends_the_import(self):
+        with mock.patch.object(StatementImport, 'write', side_effect=OperationalError('database is locked')):
+            response = self.client.post('/import/', {'file': self.upload()})
+            lines = self.lines(response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(lines, [
+            {'done': False, 'error': 'database is locked', 'rows': 4, 'expenses': 0, 'income': 0, 'skipped': 2}
+        ])
+
+    def test_rejects_unknown_formats(self):
+        response = self.client.post('/import/', {'file': self.upload(), 'format': 'xlsx'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    async def test_imports_over_asgi(self):
+        client = ASGIClient()
+
+        response = await client.post('/import/', {'file': self.upload()}, authorization=self.bearer())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.streaming)
+        self.assertEqual(self.lines(response)[-1]['income'], 1)
+        self.assertEqual(await Income.objects.acount(), 1)
+
+
+class LedgerCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'}})
+    def test_shared_backends_pass(self):
+        self.assertEqual(check_ledger_cache(None), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_backends_are_warned_about(self):
+        self.assertEqual([warning.id for warning in check_ledger_cache(None)], ['incomeexpensesapi.W001'])
+
+
+class ReplicaPinsCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'}})
+    def test_passes_without_replicas_or_with_a_shared_cache(self):
+        self.assertEqual(check_replica_pins(None), [])
+        with override_settings(DATABASE_REPLICAS=['replica1']):
+            self.assertEqual(check_replica_pins(None), [])
+
+    @override_settings(
+        DATABASE_REPLICAS=['replica1'],
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_per_process_caches_fail_with_replicas(self):
+        self.assertEqual([error.id for error in check_replica_pins(None)], ['incomeexpensesapi.E002'])
+
+
+class DefaultRendererTests(LedgerAPITestCase):
+
+    def test_wraps_every_payload_into_data(self):
+        renderer = DefaultRenderer()
+
+        self.assertEqual(renderer.render({'FOOD': 1}), b'{"data":{"FOOD":1}}')
+        self.assertEqual(renderer.render(None), b'{"data":null}')
+
+    def test_falls_back_to_the_drf_encoder(self):
+        renderer = DefaultRenderer()
+        renderer.use_orjson = False
+
+        self.assertEqual(json.loads(renderer.render({'day': date(2022, 1, 3)})), {'data': {'day': '2022-01-03'}})
+
+    def test_errors_are_rendered_as_they_are(self):
+        response = self.client.get('/cashflow/?start=yesterday')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'start': ['Date has wrong format. Use YYYY-MM-DD.']})
+
+    def test_indents_when_asked_to(self):
+        response = self.client.get('/cashflow/', HTTP_ACCEPT='application/json; indent=2')
+
+        self.assertTrue(response.content.startswith(b'{\n  "data": {'))
+
+
+class CashFlowTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add(Income, 1000, 'SALARY', day=date(2022, 1, 31))
+        self.add(Income, 1000, 'SALARY', day=date(2022, 2, 28))
+        self.add(Expense, 300, 'RENT', day=date(2022, 2, 1))
+        self.add(Expense, 50, 'FOOD', day=date(2022, 3, 2))
+        self.add(Income, 5000, 'SALARY', owner=self.create_user('other@example.com'), day=date(2022, 2, 1))
+
+    def test_nets_income_and_expenses_per_period(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/cashflow/?start=2022-01-01&end=2022-03-31&granularity=month')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()['data']
+        self.assertEqual(body['totals'], {'income': 2000, 'expenses': 350, 'net': 1650})
+        self.assertEqual(body['series'], [
+            {'period': '2022-01-01', 'income': 1000, 'expenses': 0, 'net': 1000},
+            {'period': '2022-02-01', 'income': 1000, 'expenses': 300, 'net': 700},
+            {'period': '2022-03-01', 'income': 0, 'expenses': 50, 'net': -50},
+        ])
+
+    def test_partial_months_come_from_the_ledger(self):
+        response = self.client.get('/cashflow/?start=2022-02-01&end=2022-03-01&granularity=month')
+
+        self.assertEqual(response.json()['data']['totals'], {'income': 1000, 'expenses': 300, 'net': 700})
+
+
+class UserCacheTests(SimpleTestCase):
+
+    def test_evicts_the_least_recently_used_users(self):
+        cache = UserCache(size=2, ttl=60)
+        for key in (1, 2):
+            cache.set(key, [key], cache.generation)
+        cache.get(1)
+        cache.set(3, [3], cache.generation)
+
+        self.assertEqual((cache.get(1), cache.get(2), cache.get(3)), ([1], None, [3]))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (3, 1))
+
+    def test_entries_expire(self):
+        cache = UserCache(size=2, ttl=30)
+        with mock.patch('incomeexpensesapi.authentication.time.monotonic', return_value=100):
+            cache.set(1, [1], cache.generation)
+        with mock.patch('incomeexpensesapi.authentication.time.monotonic', return_value=131):
+            self.assertIsNone(cache.get(1))
+
+    def test_users_loaded_before_an_invalidation_are_not_cached(self):
+        cache = UserCache(size=2, ttl=60)
+        generation = cache.generation
+        cache.invalidate(1)
+
+        cache.set(1, ['stale'], generation)
+
+        self.assertIsNone(cache.get(1))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'users'}})
+    def test_invalidations_of_other_processes_drop_every_entry_at_the_next_sync(self):
+        here, elsewhere = UserCache(size=2, ttl=60, sync_interval=1), UserCache(size=2, ttl=60, sync_interval=1)
+        with mock.patch('incomeexpensesapi.authentication.time.monotonic', return_value=100):
+            here.sync()
+            here.set(1, [1], here.generation)
+            elsewhere.publish()
+
+        with mock.patch('incomeexpensesapi.authentication.time.monotonic', return_value=100.5):
+            here.sync()
+            self.assertEqual(here.get(1), [1])
+
+        with mock.patch('incomeexpensesapi.authentication.time.monotonic', return_value=101):
+            here.sync()
+            self.assertIsNone(here.get(1))
+
+            here.set(1, [1], here.generation)
+            here.publish()
+        with mock.patch('incomeexpensesapi.authentication.time.monotonic', return_value=102):
+            here.sync()
+            self.assertEqual(here.get(1), [1])
+
+
+class CachedJWTAuthenticationTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=self.bearer())
+
+    def test_users_are_loaded_once(self):
+        self.client.get('/income/yearly-stats/')
+
+        # the stats are cached as well
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/income/yearly-stats/').status_code, 200)
+
+    def test_saving_a_user_drops_it(self):
+        self.client.get('/income/yearly-stats/')
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.client.get('/income/yearly-stats/').status_code, 401)
+        self.assertEqual(cache.get(SHARED_GENERATION_KEY), 1)
+
+    def test_stats_are_for_admins(self):
+        self.assertEqual(self.client.get('/auth-cache/').status_code, 403)
+
+        admin = self.create_user('admin@example.com', is_staff=True)
+        self.client.credentials(HTTP_AUTHORIZATION=self.bearer(admin))
+        response = self.client.get('/auth-cache/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'hits', 'misses', 'size', 'max_size', 'ttl'})
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+    METRICS_TOKEN='benchmark',
+)
+class BenchmarkEndpointsTests(LedgerAPITestCase):
+
+    options = {'users': 2, 'expenses': 20, 'income': 5, 'days': 60, 'requests': 2, 'seed': 0, 'label': 'test'}
+
+    def setUp(self):
+        super().setUp()
+        self.command = benchmark_endpoints.Command(stdout=StringIO())
+
+    def test_requests_every_route_successfully(self):
+        results = self.command.run({**self.options, 'only': None})
+
+        self.assertEqual(results['uncovered_routes'], [])
+        self.assertEqual([route for route in results['routes'] if route['errors']], [])
+        self.assertEqual(results['options'], {name: value for name, value in self.options.items() if name != 'label'})
+
+    def test_only_measures_the_given_routes(self):
+        results = self.command.run({**self.options, 'only': ['yearly-stats']})
+
+        self.assertEqual(
+            [route['path'] for route in results['routes']],
+            ['/expenses/yearly-stats/', '/income/yearly-stats/'],
+        )
+        self.assertEqual(results['uncovered_routes'], [])
+
+    def test_the_seed_is_reproducible(self):
+        benchmark_endpoints.Seed(random.Random(0), 1, 10, 10, 60, 1)
+        first = list(Expense.objects.values_list('date', 'amount', 'category').order_by('id'))
+        User.objects.filter(email__endswith='@benchmark.local').delete()
+
+        benchmark_endpoints.Seed(random.Random(0), 1, 10, 10, 60, 1)
+
+        self.assertEqual(list(Expense.objects.values_list('date', 'amount', 'category').order_by('id')), first)
+
+
+class QueryTimingMiddlewareTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add(Expense, 10, 'FOOD')
+
+    def entries(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_reports_the_queries_in_a_header_and_a_log_line(self):
+        with self.assertLogs('incomeexpensesapi.sql', 'INFO') as logs:
+            response = self.client.get('/expenses/yearly-stats/')
+
+        [entry] = self.entries(logs)
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual((entry['method'], entry['path'], entry['status']), ('GET', '/expenses/yearly-stats/', 200))
+        self.assertGreater(entry['queries'], 0)
+        self.assertIn('slowest', entry)
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;desc="{entry["queries"]} queries";dur=[\d.]+, db-slowest;dur=[\d.]+, app;dur=[\d.]+$',
+        )
+
+    @override_settings(SQL_TIMING_QUERY_BUDGET=1)
+    def test_requests_over_budget_are_logged_with_their_statements_and_plans(self):
+        with self.assertLogs('incomeexpensesapi.sql', 'INFO') as logs:
+            self.client.get('/expenses/')
+
+        [entry] = self.entries(logs)
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        self.assertEqual(len(entry['statements']), entry['queries'])
+        self.assertTrue(entry['plans'])
+        self.assertLessEqual(len(entry['plans']), QueryTimingMiddleware.max_explained)
+        self.assertTrue(all(re.match(r'\s*SELECT', plan['sql'], re.I) for plan in entry['plans']))
+
+    def test_streamed_responses_are_logged_once_exhausted(self):
+        with self.assertLogs('incomeexpensesapi.sql', 'INFO') as logs:
+            response = self.client.get('/expenses/export/')
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+
+        [entry] = self.entries(logs)
+        self.assertEqual(entry['path'], '/expenses/export/')
+        self.assertGreater(entry['queries'], 0)
+
+    @override_settings(SQL_TIMING_HEADER=False)
+    def test_the_header_can_be_turned_off(self):
+        with self.assertLogs('incomeexpensesapi.sql', 'INFO'):
+            response = self.client.get('/expenses/yearly-stats/')
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SQL_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        with self.assertNoLogs('incomeexpensesapi.sql'):
+            response = self.client.get('/expenses/yearly-stats/')
+
+        self.assertNotIn('Server-Timing', response)
+
+
+class MetricsTests(LedgerAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        self.metrics_dir = metrics_dir.name
+        metrics_settings = override_settings(METRICS_DIR=self.metrics_dir)
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+        registry = mock.patch.object(metrics, 'registry', metrics.Registry())
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def exited_process(self, values=(), histograms=()):
+        """
+        Writes the metrics file of a process that has exited.
+        """
+
+        child = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        path = os.path.join(self.metrics_dir, f'{child.stdout.strip()}-1.json')
+        with open(path, 'w') as f:
+            json.dump({'values': list(values), 'histograms': list(histograms)}, f)
+        return path
+
+    def test_the_counters_of_exited_processes_are_merged_once_and_their_gauges_dropped(self):
+        metrics.registry.inc('cache_requests_total', metrics.LEDGER_CACHE_HIT)
+        path = self.exited_process(
+            values=[
+                ['cache_requests_total', metrics.LEDGER_CACHE_HIT, 4],
+                ['cache_requests_total', metrics.LEDGER_CACHE_MISS, 5],
+                ['cache_entries', [['cache', 'ledger']], 7],
+            ],
+            histograms=[['db_queries_per_request', [['route', '/'], ['method', 'GET']], [1] * 11]],
+        )
+
+        for _ in range(2):
+            values, histograms, current = metrics.registry.collect()
+
+            self.assertEqual(values['cache_requests_total', metrics.LEDGER_CACHE_HIT], 5)
+            self.assertEqual(values['cache_requests_total', metrics.LEDGER_CACHE_MISS], 5)
+            self.assertNotIn(('cache_entries', (('cache', 'ledger'),)), values)
+            self.assertEqual(histograms['db_queries_per_request', (('route', '/'), ('method', 'GET'))], [1] * 11)
+            self.assertEqual(current['cache_requests_total', metrics.LEDGER_CACHE_HIT], 1)
+            self.assertFalse(os.path.exists(path))
+
+        self.assertIn('retired.json', os.listdir(self.metrics_dir))
+
+    def test_hit_ratios_are_of_the_running_processes(self):
+        metrics.registry.inc('cache_requests_total', metrics.LEDGER_CACHE_HIT)
+        self.exited_process(values=[['cache_requests_total', metrics.LEDGER_CACHE_MISS, 3]])
+
+        self.assertIn('cache_hit_ratio{cache="ledger"} 1.0000', metrics.render())
+
+    def test_unknown_methods_share_a_series(self):
+        for method in ('GET', 'BREW', 'PROPFIND'):
+            self.client.generic(method, '/cashflow/')
+
+        requests = {labels: value for (name, labels), value in metrics.registry.collect()[0].items() if name == 'http_requests_total'}
+
+        self.assertEqual({dict(labels)['method'] for labels in requests}, {'GET', 'other'})
+        self.assertEqual(sum(value for labels, value in requests.items() if dict(labels)['method'] == 'other'), 2)
+
+    def test_reset_replaces_the_lock(self):
+        registry = metrics.Registry()
+        registry.lock.acquire()
+
+        registry.reset()
+
+        self.assertTrue(registry.lock.acquire(blocking=False))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scrapers_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE http_requests_total counter', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='')
+    def test_without_a_token_only_local_requests_in_debug_are_answered(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics/').status_code, 200)
+            self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+
+    def connect(self, **options):
+        """
+        A connection to a database file of its own, with the `options` of the
+        default database updated by `options`.
+        """
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = connections['default'].settings_dict
+        connection = DatabaseWrapper({
+            **settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'OPTIONS': {**settings_dict['OPTIONS'], **options},
+        }, alias='sqlite-backend-test')
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connections_run_the_pragmas(self):
+        connection = self.connect(pragmas={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234})
+
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 1234)
+
+    def test_transactions_begin_in_the_configured_mode(self):
+        for mode in ('immediate', 'DEFERRED'):
+            with self.subTest(mode=mode):
+                connection = self.connect(transaction_mode=mode)
+
+                with CaptureQueriesContext(connection) as captured:
+                    connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    connection.set_autocommit(True)
+
+                self.assertEqual(captured[0]['sql'], f'BEGIN {mode.upper()}')
+
+    def test_immediate_transactions_wait_for_the_write_lock(self):
+        writer = self.connect(transaction_mode='IMMEDIATE')
+        other = DatabaseWrapper({
+            **writer.settings_dict, 'OPTIONS': {**writer.settings_dict['OPTIONS'], 'pragmas': {'busy_timeout': 50}}
+        }, alias='sqlite-backend-test-2')
+        self.addCleanup(other.close)
+        writer.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        self.addCleanup(writer.set_autocommit, True)
+
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            other.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+
+    def test_rejects_invalid_options(self):
+        for options in [{'transaction_mode': 'LAZY'}, {'pragmas': {'journal_mode': 'WAL; DROP TABLE x'}}]:
+            with self.subTest(options=options), self.assertRaises(ImproperlyConfigured):
+                self.connect(**options).ensure_connection()
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica1'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replicas'}},
+)
+class ReplicaRoutingTests(LedgerAPITestCase):
+    """
+    The test databases have no replicas: the aliases `ReplicaRouter` picks are
+    recorded, and every query is run on the primary.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=self.bearer())
+        self.add(Expense, 10, 'FOOD')
+
+    def read(self, path):
+        """
+        The response to `GET path`, and the databases its reads were routed to,
+        by model. Tests run within transactions, which would send every read
+        to the primary, so the router is only told about those the request
+        opened itself.
+        """
+
+        aliases = {}
+        route = ReplicaRouter.db_for_read
+        connection = connections[DEFAULT_DB_ALIAS]
+        test_transactions = len(connection.atomic_blocks)
+
+        def db_for_read(router, model, **hints):
+            with mock.patch.object(connection, 'in_atomic_block', len(connection.atomic_blocks) > test_transactions):
+                aliases.setdefault(model, set()).add(route(router, model, **hints))
+            return DEFAULT_DB_ALIAS
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', db_for_read):
+            response = self.client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, aliases
+
+    def ledger_reads(self, aliases):
+        return set().union(*(routed for model, routed in aliases.items() if model is not User))
+
+    def test_list_detail_and_stats_views_read_from_a_replica(self):
+        for path in ['/expenses/', '/expenses/yearly-stats/', '/income/source-averages/', '/cashflow/']:
+            with self.subTest(path=path):
+                response, aliases = self.read(path)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.ledger_reads(aliases), {'replica1'})
+
+    @override_settings(REPLICA_READ_VIEWS={'cashflow'})
+    def test_only_the_listed_views_read_from_a_replica(self):
+        _, aliases = self.read('/expenses/')
+        self.assertEqual(self.ledger_reads(aliases), {DEFAULT_DB_ALIAS})
+
+        _, aliases = self.read('/cashflow/')
+        self.assertEqual(self.ledger_reads(aliases), {'replica1'})
+
+    def test_users_are_read_from_the_primary(self):
+        user_cache.clear()
+
+        _, aliases = self.read('/expenses/')
+
+        self.assertEqual(aliases[User], {DEFAULT_DB_ALIAS})
+
+    def test_other_views_read_from_the_primary(self):
+        self.user.is_verified = False
+        self.user.save()
+        token = RefreshToken.for_user(self.user).access_token
+
+        for path in [f'/auth/verify-email/?token={token}', '/expenses/budgets/']:
+            with self.subTest(path=path):
+                response, aliases = self.read(path)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(set.union(*aliases.values()), {DEFAULT_DB_ALIAS})
+
+    def test_writers_read_from_the_primary_for_a_while(self):
+        response = self.client.post('/expenses/', {'date': date.today(), 'amount': 5, 'description': 'x', 'category': 'FOOD'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(cache.get(pin_key(self.user.id)))
+
+        _, aliases = self.read('/expenses/')
+        self.assertEqual(self.ledger_reads(aliases), {DEFAULT_DB_ALIAS})
+
+        cache.delete(pin_key(self.user.id))
+        _, aliases = self.read('/expenses/')
+        self.assertEqual(self.ledger_reads(aliases), {'replica1'})
+
+    def test_unsafe_requests_pin_their_user_before_the_view_runs(self):
+        pinned = []
+        create = ExpenseListAPIView.create
+
+        def spy(view, request, *args, **kwargs):
+            pinned.append(cache.get(pin_key(self.user.id)))
+            return create(view, request, *args, **kwargs)
+
+        with mock.patch.object(ExpenseListAPIView, 'create', spy):
+            self.client.post('/expenses/', {'date': date.today(), 'amount': 5, 'description': 'x', 'category': 'FOOD'})
+
+        self.assertEqual(pinned, [True])
+
+    def test_streamed_imports_pin_their_user_once_done(self):
+        statement = SimpleUploadedFile('statement.csv', b'date,amount,description\n2022-01-03,-12.50,groceries\n')
+
+        response = self.client.post('/import/', {'file': statement})
+        self.assertTrue(cache.get(pin_key(self.user.id)))
+        cache.delete(pin_key(self.user.id))
+        b''.join(response.streaming_content)
+
+        self.assertTrue(cache.get(pin_key(self.user.id)))
+        self.assertTrue(Expense.objects.filter(description='groceries').exists())
@@ -0,0 +1,197 @@
+import math
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Every how many checks a store drops the buckets that have refilled
+# completely, which are the same as no bucket at all.
+PURGE_EVERY = 1000
+
+
+class LocMemBucketStore:
+    """
+    Buckets in a dict of the current process, for development and tests:
+    every worker process throttles on its own.
+    """
+
+    def __init__(self, location=None):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.checks = 0
+
+    def consume(self, key, interval, limit):
+        """
+        Takes a token from the bucket of `key`, refilled with one token every
+        `interval` seconds and holding `limit / interval` tokens when full.
+
+        Returns 0 if a token was taken, or else the seconds until one will be
+        available. Buckets are stored as the time they will be full again (the
+        "theoretical arrival time" of GCRA), a single number per key.
+        """
+
+        now = time.time()
+        with self.lock:
+            self.checks += 1
+            if self.checks % PURGE_EVERY == 0:
+                self.buckets = {key: full_at for key, full_at in self.buckets.items() if full_at > now}
+
+            full_at = max(self.buckets.get(key, now), now) + interval
+            if full_at - now > limit:
+                return full_at - now - limit
+            self.buckets[key] = full_at
+            return 0
+
+
+class SQLiteBucketStore:
+    """
+    Buckets in an SQLite database at `location`, shared by all the worker
+    processes of a host. Taking a token is a single atomic upsert, so
+    concurrent requests can't both take the last one; only rejected requests
+    read the bucket again to tell how long to wait.
+    """
+
+    def __init__(self, location):
+        self.location = str(location)
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.location, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_bucket (key TEXT PRIMARY KEY, full_at REAL NOT NULL) WITHOUT ROWID'
+            )
+            self.local.connection = connection
+            self.local.checks = 0
+        return connection
+
+    def consume(self, key, interval, limit):
+        """
+        Same as `LocMemBucketStore.consume`.
+        """
+
+        connection = self.connection()
+        now = time.time()
+
+        self.local.checks += 1
+        if self.local.checks % PURGE_EVERY == 0:
+            connection.execute('DELETE FROM throttle_bucket WHERE full_at <= ?', (now,))
+
+        params = {'key': key, 'now': now, 'interval': interval, 'limit': limit}
+        taken = connection.execute(
+            'INSERT INTO throttle_bucket (key, full_at) VALUES (:key, :now + :interval) '
+            'ON CONFLICT (key) DO UPDATE SET full_at = max(full_at, :now) + :interval '
+            'WHERE max(full_at, :now) + :interval - :now <= :limit '
+            'RETURNING full_at',
+            params
+        ).fetchone()
+        if taken is not None:
+            return 0
+
+        row = connection.execute('SELECT full_at FROM throttle_bucket WHERE key = ?', (key,)).fetchone()
+        return max(row[0] + interval - now - limit, 0) if row else 0
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.THROTTLE_STORE)(settings.THROTTLE_LOCATION)
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting in ('THROTTLE_STORE', 'THROTTLE_LOCATION'):
+        _store = None
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle of the views with a `throttle_scope`, keyed by
+    whatever `get_cache_key` returns. Its rate is the scope's
+    `DEFAULT_THROTTLE_RATES` entry for `key_name`: `'5/min'` is a bucket of
+    5 tokens, refilled with one every 12 seconds, so clients can burst up to
+    5 requests and then make one every 12 seconds.
+
+    The buckets live in the `THROTTLE_STORE`, one atomic operation per check.
+    Rejected requests get a 429 with a `Retry-After` header.
+    """
+
+    key_name = None
+
+    @property
+    def THROTTLE_RATES(self):
+        # Read on every request rather than once at import like
+        # `SimpleRateThrottle` does, so overridden settings take effect.
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def __init__(self):
+        # The rate depends on the view, see `allow_request`.
+        self.retry_after = 0
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+
+        self.scope = f'{scope}_{self.key_name}'
+        if self.scope not in self.THROTTLE_RATES:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        # A hair above `duration`, so floating point rounding of the interval
+        # can't cost a full bucket its last token.
+        self.retry_after = get_store().consume(key, self.duration / self.num_requests, self.duration + 1e-6)
+        return not self.retry_after
+
+    def wait(self):
+        return math.ceil(self.retry_after)
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Throttles by client IP (behind `NUM_PROXIES` proxies).
+    """
+
+    key_name = 'ip'
+
+    def get_cache_key(self, request, view):
+        return f'{self.scope}:{self.get_ident(request)}'
+
+
+class EmailRateThrottle(TokenBucketThrottle):
+    """
+    Throttles by the `email` in the request body, whatever IP the requests
+    come from. Bodies without one are left to the view to reject.
+    """
+
+    key_name = 'email'
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return f'{self.scope}:{email.strip().lower()}'
@@ -0,0 +1,211 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Trunc
+
+from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+
+from expenses.models import Expense
+from income.models import Income
+
+from .aggregates import Totals
+from .caching import cache_per_user, conditional_get
+from .renderers import DefaultRenderer
+from .rollups import ROLLUPS, next_month, split_window
+from .utils import get_date_param
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+
+def truncate(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def step(period, granularity):
+    if granularity == 'week':
+        return period + timedelta(days=7)
+    if granularity == 'month':
+        return next_month(period)
+    if granularity == 'year':
+        return period.replace(year=period.year + 1)
+    return period + timedelta(days=1)
+
+
+def periods(start, end, granularity):
+    """
+    Yields the first day of every `granularity` long period overlapping
+    the `start`-`end` window.
+    """
+
+    period = truncate(start, granularity)
+    while period <= end:
+        yield period
+        period = step(period, granularity)
+
+
+def count_periods(start, end, granularity):
+    days = (end - start).days
+    return {'day': days, 'week': days // 7, 'month': days // 28, 'year': days // 365}[granularity] + 1
+
+
+def bucketed(model, owner, start, end, granularity, label=None, **filters):
+    """
+    Builds the queries totalling `owner`'s records dated within `start` and
+    `end` (inclusive) per `granularity` long period, yielding
+    `(period, total, records)` rows, followed by `label` if given. Meant to be
+    combined with `union`. A period may come up in more than one of them.
+
+    Records are bucketed in the database with `Trunc`. For monthly and yearly
+    buckets the months lying entirely within the window come from the
+    rollups, only the partial months at the edges are read from the ledger.
+    """
+
+    def totals(queryset, date_field, total, records):
+        queryset = queryset.order_by().annotate(
+            period=Trunc(date_field, granularity)
+        ).values('period').annotate(
+            _total=Sum(total),
+            _records=records
+        )
+        if label is None:
+            return queryset.values_list('period', '_total', '_records')
+        return queryset.annotate(_label=Value(label)).values_list('period', '_total', '_records', '_label')
+
+    ledger = model.objects.filter(owner=owner, **filters)
+
+    if granularity not in ('month', 'year'):
+        return [totals(ledger.filter(date__gte=start, date__lte=end), 'date', 'amount', Count('id'))]
+
+    rollup_model, _ = ROLLUPS[model]
+    full_months, edges = split_window(start, end)
+
+    return [
+        totals(rollup_model.objects.filter(full_months, owner=owner, **filters), 'month', 'total', Sum('records')),
+        totals(ledger.filter(edges), 'date', 'amount', Count('id')),
+    ]
+
+
+def combine(queries):
+    return queries[0].union(*queries[1:], all=True) if len(queries) > 1 else queries[0]
+
+
+def timeseries(model, owner, start, end, granularity, **filters):
+    """
+    Totals of `owner`'s records per `granularity` long period between `start`
+    and `end`, zero-filled, as `(period, Totals)` pairs, read with a single
+    query. See `bucketed`.
+    """
+
+    found = {}
+    for period, total, records in combine(bucketed(model, owner, start, end, granularity, **filters)):
+        found[period] = found.get(period, Totals(0, 0)) + Totals(total, records)
+
+    return [(period, found.get(period, Totals(0, 0))) for period in periods(start, end, granularity)]
+
+
+def cashflow(owner, start, end, granularity):
+    """
+    Income and expenses per `granularity` long period between `start` and
+    `end`, zero-filled, as `(period, income, expenses)` triples. Both tables
+    (or their rollups) are read in a single `UNION ALL` query.
+    """
+
+    queries = (
+        bucketed(Income, owner, start, end, granularity, label='income')
+        + bucketed(Expense, owner, start, end, granularity, label='expenses')
+    )
+
+    found = defaultdict(lambda: {'income': 0, 'expenses': 0})
+    for period, total, _, label in combine(queries):
+        found[period][label] += total
+
+    return [
+        (period, found[period]['income'], found[period]['expenses'])
+        for period in periods(start, end, granularity)
+    ]
+
+
+def get_window(request, max_periods):
+    """
+    Reads and validates the `start`, `end` and `granularity` query parameters.
+    """
+
+    end = get_date_param(request, 'end', date.today())
+    start = get_date_param(request, 'start', end - timedelta(days=365))
+    if start > end:
+        raise ValidationError({'start': ['Must not be after `end`.']})
+
+    granularity = request.query_params.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise ValidationError({'granularity': [f"Choose one of: {', '.join(GRANULARITIES)}."]})
+    if count_periods(start, end, granularity) > max_periods:
+        raise ValidationError({'granularity': [f"Too many periods, at most {max_periods} are allowed."]})
+
+    return start, end, granularity
+
+
+WINDOW_PARAMETERS = [
+    openapi.Parameter('start', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+    openapi.Parameter('end', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+    openapi.Parameter('granularity', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(GRANULARITIES)),
+]
+
+
+class TimeSeriesAPIView(APIView):
+    """
+    Totals of the current user's `model` records per day, week (starting on
+    Monday), month or year between `start` and `end` (the last 365 days by
+    default), optionally limited to a single category/source (`?category=`
+    or `?source=`, after `key_field`), with empty periods filled in with zeros.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [DefaultRenderer]
+
+    model = None
+    key_field = None
+    max_periods = 5000
+
+    def get_filters(self, request):
+        value = request.query_params.get(self.key_field)
+        if not value:
+            return {}
+
+        choices = dict(self.model._meta.get_field(self.key_field).choices)
+        if value not in choices:
+            raise ValidationError({self.key_field: [f"Choose one of: {', '.join(choices)}."]})
+        return {self.key_field: value}
+
+    @swagger_auto_schema(manual_parameters=WINDOW_PARAMETERS + [
+        openapi.Parameter('category', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Expenses only.'),
+        openapi.Parameter('source', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Income only.'),
+    ])
+    @conditional_get
+    @cache_per_user
+    def get(self, request):
+
+        start, end, granularity = get_window(request, self.max_periods)
+        series = timeseries(self.model, request.user, start, end, granularity, **self.get_filters(request))
+
+        return Response({
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'series': [
+                {'period': period, 'total': totals.total, 'records': totals.count}
+                for period, totals in series
+            ]
+        }, status=status.HTTP_200_OK)
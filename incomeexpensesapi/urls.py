@@ -20,6 +20,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from .views import AuthCacheStatsAPIView, CashFlowAPIView, MetricsView, StatementImportAPIView
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Income Expenses API",
@@ -39,5 +41,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('authentication.urls')),
     path('expenses/', include('expenses.urls')),
-    path('income/', include('income.urls'))
+    path('income/', include('income.urls')),
+    path('import/', StatementImportAPIView.as_view(), name='statement-import'),
+    path('cashflow/', CashFlowAPIView.as_view(), name='cashflow'),
+    path('auth-cache/', AuthCacheStatsAPIView.as_view(), name='auth-cache'),
+    path('metrics/', MetricsView.as_view(), name='metrics')
 ]
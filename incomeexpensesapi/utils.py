@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from rest_framework.exceptions import ValidationError
+
+
+def get_date_param(request, name, default=None):
+    """
+    Reads an optional ISO formatted date from the query string.
+    """
+
+    value = request.query_params.get(name)
+    if not value:
+        return default
+
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: ['Date has wrong format. Use YYYY-MM-DD.']})
+
+
+def streaming_response(request, streaming_content, **kwargs):
+    """
+    A `StreamingHttpResponse` of `streaming_content`, except when served over
+    ASGI: Django 4.1's `ASGIHandler` iterates streamed responses within the
+    event loop, where the ORM can't be used, so the content is produced right
+    away, in the view's thread, and sent as a regular response instead.
+    Serve the app with WSGI to stream these responses.
+    """
+
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return HttpResponse(streaming_content, **kwargs)
+    return StreamingHttpResponse(streaming_content, **kwargs)
@@ -0,0 +1,160 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+
+from rest_framework import permissions, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+
+from .authentication import user_cache
+from .caching import cache_per_user, conditional_get
+from .imports import StatementImport
+from .metrics import render as render_metrics
+from .renderers import DefaultRenderer
+from .timeseries import WINDOW_PARAMETERS, cashflow, get_window
+from .utils import streaming_response
+
+
+class StatementImportAPIView(APIView):
+    """
+    Imports an uploaded bank statement (CSV or NDJSON, see `StatementImport`)
+    into the current user's `Expense` and `Income` records. The response is
+    streamed as NDJSON, one progress line per imported chunk followed by
+    a final summary line, so arbitrarily large statements never have to be
+    held in memory.
+
+    The status is sent before the import runs, so it is always 200: whether
+    the import went through is told by the `done` of the last line, along
+    with the `errors` of the skipped rows, or the `error` that stopped it.
+    Over ASGI the response is only sent once the import is over, see
+    `streaming_response`.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    # rows written per transaction, and per progress line
+    chunk_size = 1000
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('file', in_=openapi.IN_FORM, type=openapi.TYPE_FILE, required=True),
+        openapi.Parameter('format', in_=openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(StatementImport.FORMATS)),
+        openapi.Parameter('kind', in_=openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(StatementImport.KINDS)),
+    ])
+    def post(self, request):
+
+        statement = request.FILES.get('file')
+        if statement is None:
+            return Response({
+                'Error': 'Upload the statement as `file`.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        default_format = 'ndjson' if statement.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+        try:
+            statement_import = StatementImport(
+                request.user,
+                codecs.iterdecode(statement, 'utf-8-sig'),
+                format=request.data.get('format', default_format),
+                kind=request.data.get('kind', 'auto'),
+                chunk_size=self.chunk_size
+            )
+        except ValueError as e:
+            return Response({
+                'Error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        def stream():
+            try:
+                for progress in statement_import.run():
+                    yield json.dumps(progress) + '\n'
+            except (ValueError, csv.Error, DatabaseError) as e:
+                # Chunks written so far stay imported.
+                yield json.dumps({'done': False, 'error': str(e), **statement_import.progress()}) + '\n'
+                return
+
+            yield json.dumps({'done': True, **statement_import.progress(), 'errors': statement_import.errors}) + '\n'
+
+        return streaming_response(request, stream(), content_type='application/x-ndjson', status=status.HTTP_200_OK)
+
+
+class CashFlowAPIView(APIView):
+    """
+    Income, expenses and net cash flow of the current user per day, week,
+    month or year between `start` and `end` (the last 365 days by default),
+    read from both tables with a single query.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [DefaultRenderer]
+    max_periods = 5000
+
+    @swagger_auto_schema(manual_parameters=WINDOW_PARAMETERS)
+    @conditional_get
+    @cache_per_user
+    def get(self, request):
+
+        start, end, granularity = get_window(request, self.max_periods)
+
+        series = [
+            {'period': period, 'income': income, 'expenses': expenses, 'net': income - expenses}
+            for period, income, expenses in cashflow(request.user, start, end, granularity)
+        ]
+        income = sum(entry['income'] for entry in series)
+        expenses = sum(entry['expenses'] for entry in series)
+
+        return Response({
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'totals': {'income': income, 'expenses': expenses, 'net': income - expenses},
+            'series': series
+        }, status=status.HTTP_200_OK)
+
+
+class AuthCacheStatsAPIView(APIView):
+    """
+    Hit/miss counters and size of this process' cache of JWT authenticated
+    users (see `CachedJWTAuthentication`). Admins only.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(user_cache.stats(), status=status.HTTP_200_OK)
+
+
+class MetricsView(View):
+    """
+    Request, database and cache metrics of all the worker processes in the
+    Prometheus text format (see `incomeexpensesapi.metrics`), for scrapers
+    sending the `METRICS_TOKEN` as a bearer token. Without a token set
+    nobody is answered, but local requests with `DEBUG` on: behind a proxy
+    on the same host, every request is local.
+
+    A plain Django view, DRF's JWT authentication would reject the token.
+    """
+
+    http_method_names = ['get']
+
+    def get(self, request):
+        if settings.METRICS_TOKEN:
+            allowed = constant_time_compare(
+                request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+            )
+        else:
+            allowed = settings.DEBUG and request.META.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+
+        if not allowed:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')